@@ -40,8 +40,9 @@ export namespace DataLibrarian {
         /**
          * Fetch file list via POST.
          * Path is sent in BODY, not URL.
+         * Pass sort = "size" to list the largest entries (by recursive folder size) first.
          */
-        export async function getLibraryFiles(path: string = ""): Promise<DLApiTypes.ApiResponse<DLTypes.CatalogCard[]>> {
+        export async function getLibraryFiles(path: string = "", sort?: "size"): Promise<DLApiTypes.ApiResponse<DLTypes.CatalogCard[]>> {
 
             if (!isValidPath(path)) {
                 return { success: false, error: "Invalid Path Detected: '..' and '~' are not allowed." };
@@ -50,7 +51,19 @@ export namespace DataLibrarian {
             return DLApi.ApiServer.handleRequest<DLTypes.CatalogCard[]>({
                 type: DLEnums.RequestType.POST,
                 endpoint: DLEnums.Endpoints.LIBRARY,
-                data: { path } // Path in Body
+                data: sort ? { path, sort } : { path } // Path in Body
+            });
+        }
+
+        /**
+         * Search file paths across the whole library via POST.
+         * Results are ranked by the backend and paginated.
+         */
+        export async function searchLibrary(query: string, page: number = 1, pageSize: number = 50): Promise<DLApiTypes.ApiResponse<DLTypes.SearchPage>> {
+            return DLApi.ApiServer.handleRequest<DLTypes.SearchPage>({
+                type: DLEnums.RequestType.POST,
+                endpoint: DLEnums.Endpoints.SEARCH,
+                data: { query, page, page_size: pageSize }
             });
         }
     }
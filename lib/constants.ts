@@ -3,7 +3,8 @@ export namespace DataLibrarian {
         STATUS = '/api/status',
         ACTION = '/api/action',
         CONFIG = '/api/config',
-        LIBRARY = '/api/library'
+        LIBRARY = '/api/library',
+        SEARCH = '/api/search'
     }
 
     export enum RequestType {
@@ -0,0 +1,294 @@
+"""
+Headless batch runner for The Data Librarian.
+Runs the duplicate cleaner (weed) or the PDF splitter (segment) directly, without
+starting the web server, using the same config.json. Everything the job would
+print is streamed to stdout as newline-delimited JSON, one event per line:
+
+    {"event": "start",    "job": "weed", "target": "/mnt/a", ...}
+    {"event": "log",      "job": "weed", "message": "Scanning directory: /mnt/a"}
+    {"event": "progress", "job": "weed", "files_checked": 500, "total_files": 2000, "percent": 25.0}
+    {"event": "result",   "job": "weed", "target": "/mnt/a", "status": "ok", "data": {...}}
+    {"event": "end",      "exit_code": 0}
+
+Exit codes: 0 ok, 1 failed, 2 bad arguments, 3 finished with per-file errors,
+130 cancelled (SIGINT/SIGTERM; the current job stops cleanly and still reports).
+
+Usage (from the python_core folder):
+    python -m batch_cli weed --target /mnt/a --workers 2 [--apply]
+    python -m batch_cli segment --target /mnt/a/scans --max-mb 50
+
+The library root (--root) defaults to the target. Relative paths in config.json
+(holding bin, index) are taken from it, as they are for a server started there.
+
+Run one instance per volume to process volumes in parallel. Each instance tags
+its log and plan files with its process id so they never collide.
+
+Author: Jesse Tudela
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+from datetime import datetime
+
+import config
+import web_interface
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_PARTIAL = 3
+EXIT_CANCELLED = 130
+
+
+class EventStream:
+    """
+    Writes one JSON object per line to a text stream. Thread-safe.
+    """
+
+    def __init__(self, out):
+        self._out = out
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields) -> None:
+        record = {"event": event, "time": datetime.now().isoformat()}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._out.write(line)
+            self._out.flush()
+
+
+class LogCapture:
+    """
+    Stands in for sys.stdout while a job runs, turning each printed line into a log event.
+    Keeps stdout pure NDJSON even though the jobs log with print().
+    """
+
+    def __init__(self, events: EventStream):
+        self._events = events
+        self._lock = threading.Lock()
+        self._partial = ""
+        self.job = None
+
+    def write(self, text):
+        with self._lock:
+            lines = (self._partial + text).split("\n")
+            self._partial = lines.pop()
+        for line in lines:
+            if line.strip():
+                self._events.emit("log", job=self.job, message=line)
+        return len(text)
+
+    def flush(self):
+        with self._lock:
+            line, self._partial = self._partial, ""
+        if line.strip():
+            self._events.emit("log", job=self.job, message=line)
+
+
+def run_job(target, args, events: EventStream, capture: LogCapture):
+    """
+    Runs one job in a worker thread, emitting progress from this thread until it finishes.
+
+    Returns:
+        tuple: (status, summary dict or None)
+    """
+    outcome = {}
+
+    def work():
+        if args.job == "weed":
+            outcome["summary"] = web_interface.run_script(target)
+        else:
+            outcome["summary"] = web_interface.run_pdf_script(
+                target, args.max_mb, args.pages, args.memory_budget_mb, args.deduplicate, args.recompress
+            )
+
+    capture.job = args.job
+    events.emit("start", job=args.job, target=target, pid=os.getpid())
+    worker = threading.Thread(target=work, name=f"{args.job}-job")
+    worker.start()
+
+    last = None
+    while worker.is_alive():
+        worker.join(args.progress_interval)
+        if args.job == "weed":
+            current = (web_interface.files_checked, web_interface.total_files)
+            if current != last and current[1]:
+                last = current
+                events.emit("progress", job=args.job, files_checked=current[0], total_files=current[1],
+                            percent=round(100.0 * current[0] / current[1], 1))
+    capture.flush()
+
+    summary = outcome.get("summary")
+    if summary is None:
+        status = "failed"
+    elif summary.get("cancelled"):
+        status = "cancelled"
+    elif summary.get("errors") or summary.get("apply_errors"):
+        status = "errors"
+    else:
+        status = "ok"
+    events.emit("result", job=args.job, target=target, status=status, data=summary)
+    return status, summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m batch_cli",
+        description="Run Data Librarian jobs without the web server, streaming NDJSON to stdout.",
+    )
+    parser.add_argument("--config", help="Path to config.json (default: ./config.json)")
+    parser.add_argument("--root", help="Library root: holds the path index and, unless configured otherwise, "
+                                       "the holding bin (default: the target, or the targets' common folder)")
+    parser.add_argument("--progress-interval", type=float, default=1.0, metavar="SECONDS",
+                        help="Seconds between progress events")
+    parser.add_argument("--io-bytes-per-sec", type=float, help="Override IO_BYTES_PER_SEC for this run")
+    subparsers = parser.add_subparsers(dest="job", required=True)
+
+    weed = subparsers.add_parser("weed", help="Find duplicate files and write (optionally apply) a plan")
+    weed.add_argument("--target", action="append", default=[], help="Folder to scan; repeat for several (run in turn)")
+    weed.add_argument("--workers", type=int, help="Hashing workers per device, for every device type")
+    weed.add_argument("--move-workers", type=int, help="Concurrent movers when applying the plan")
+    weed.add_argument("--apply", action="store_true", help="Apply the plan after detection (sets MOVE_DUPLICATES)")
+    weed.add_argument("--action", choices=("move", "hardlink", "reflink"), help="Override DUPLICATE_ACTION")
+    weed.add_argument("--holding-dir", help="Override DUPLICATE_HOLDING_DIR (keep it on the scanned volume for fast moves)")
+
+    segment = subparsers.add_parser("segment", help="Split PDFs larger than --max-mb")
+    segment.add_argument("--target", action="append", default=[], required=True,
+                         help="Folder to process; repeat for several (run in turn)")
+    segment.add_argument("--max-mb", type=float, help="Override PDF_TARGET_CHUNK_MB")
+    segment.add_argument("--pages", type=int, help="Override PDF_PAGE_CHUNK_LIMIT")
+    segment.add_argument("--memory-budget-mb", type=int, help="Override PDF_MEMORY_BUDGET_MB")
+    segment.add_argument("--deduplicate", action="store_true", default=None, help="Enable packing mode")
+    segment.add_argument("--recompress", action="store_true", default=None, help="Re-deflate content streams")
+    return parser.parse_args(argv)
+
+
+def resolve_root(args):
+    """
+    Works out the library root and absolute targets.
+    Targets default to the root; the root defaults to the target (or the targets' common folder).
+
+    Returns:
+        tuple: (root, targets, error message or None)
+    """
+    targets = [os.path.abspath(t) for t in args.target]
+    if args.root:
+        root = os.path.abspath(args.root)
+    elif targets:
+        root = os.path.commonpath(targets)
+        if os.path.dirname(root) == root:
+            return None, targets, "targets share no common folder; pass --root"
+    else:
+        root = os.path.abspath(".")
+    targets = targets or [root]
+    for target in targets:
+        if not os.path.isdir(target):
+            return root, targets, f"target folder not found: {target}"
+        if target != root and not target.startswith(root + os.sep):
+            return root, targets, f"target {target} is outside the root {root}"
+    return root, targets, None
+
+
+def apply_overrides(args, root):
+    """
+    Loads config.json, then layers the command-line overrides on top for this process only.
+    Relative paths in config.json are taken from the root, as the web server (run from the
+    library root) would; relative paths given on the command line are taken from the current folder.
+    """
+    if args.config:
+        config.CONFIG_FILE = args.config
+    config.load_config()
+    config.DUPLICATE_HOLDING_DIR = os.path.normpath(os.path.join(root, config.DUPLICATE_HOLDING_DIR))
+    config.INDEX_PATH = os.path.normpath(os.path.join(root, config.INDEX_PATH))
+
+    # Parallel instances start within the same second; the pid keeps their logs and plans apart
+    config.LOG_NAME_PREFIX = f"{os.path.splitext(config.LOG_NAME_PREFIX)[0]}_{os.getpid()}"
+    if args.io_bytes_per_sec is not None:
+        config.IO_BYTES_PER_SEC = args.io_bytes_per_sec
+
+    if args.job == "weed":
+        if args.workers is not None:
+            config.DEVICE_WORKERS = {kind: max(1, args.workers) for kind in config.DEFAULTS["DEVICE_WORKERS"]}
+        if args.move_workers is not None:
+            config.MOVE_WORKERS = max(1, args.move_workers)
+        if args.apply:
+            config.MOVE_DUPLICATES = True
+        if args.action:
+            config.DUPLICATE_ACTION = args.action
+        if args.holding_dir:
+            config.DUPLICATE_HOLDING_DIR = os.path.abspath(args.holding_dir)
+            # The bin holds this run's log and plan; never scan it
+            config.EXCLUDED_FOLDERS = list(config.EXCLUDED_FOLDERS) + [os.path.basename(os.path.normpath(args.holding_dir))]
+    else:
+        if args.max_mb is None:
+            args.max_mb = config.PDF_TARGET_CHUNK_MB
+        if args.pages is None:
+            args.pages = config.PDF_PAGE_CHUNK_LIMIT
+        if args.memory_budget_mb is None:
+            args.memory_budget_mb = config.PDF_MEMORY_BUDGET_MB
+        if args.deduplicate is None:
+            args.deduplicate = config.PDF_DEDUPLICATE_RESOURCES
+        if args.recompress is None:
+            args.recompress = config.PDF_RECOMPRESS_STREAMS
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    root, targets, error = resolve_root(args)
+    if error:
+        print(f"error: {error}", file=sys.stderr)
+        return EXIT_USAGE
+
+    events = EventStream(sys.stdout)
+    capture = LogCapture(events)
+    real_stdout = sys.stdout
+    sys.stdout = capture
+    stop_signal = None
+
+    def request_stop(signum, _frame):
+        # Let the running job finish its current step and write its plan/log.
+        # No output here: the handler may interrupt an emit in progress.
+        nonlocal stop_signal
+        stop_signal = signal.Signals(signum).name
+        web_interface.keep_running = False
+        web_interface.pdf_keep_running = False
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    statuses = []
+    try:
+        apply_overrides(args, root)
+        web_interface.root_directory = root
+        # Nothing polls the UI buffers here; every line already goes out as an event
+        web_interface.keep_output_buffers = False
+        web_interface.output_buffer.clear()
+        web_interface.pdf_output_buffer.clear()
+        for target in targets:
+            if stop_signal:
+                break
+            status, _summary = run_job(target, args, events, capture)
+            statuses.append(status)
+    finally:
+        capture.flush()
+        sys.stdout = real_stdout
+
+    if stop_signal or "cancelled" in statuses:
+        exit_code = EXIT_CANCELLED
+    elif "failed" in statuses:
+        exit_code = EXIT_FAILED
+    elif "errors" in statuses:
+        exit_code = EXIT_PARTIAL
+    else:
+        exit_code = EXIT_OK
+    events.emit("end", exit_code=exit_code, jobs=len(statuses), signal=stop_signal)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Startup-time benchmark for The Data Librarian.
+Runs each entry module under `python -X importtime` in a fresh interpreter
+and fails if its cumulative import time exceeds the budget, if importing it
+prints anything (config I/O on import), or if it pulls in a deferred heavy
+dependency such as pypdf.
+
+Usage:
+    python bench_startup.py [--runs N] [--scale FACTOR]
+
+Author: Jesse Tudela
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Cumulative import-time budget per module, in microseconds (best of N runs).
+# Generous enough for slow VMs; importing pypdf alone costs more than any of these.
+IMPORT_BUDGETS_US = {
+    "utils": 50000,
+    "config": 50000,
+    "web_interface": 250000,
+}
+
+# Modules that must never be imported as a side effect of loading an entry module
+DEFERRED_MODULES = ["pypdf"]
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Matches lines such as: "import time:       312 |       1045 | web_interface"
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s?(\s*)(\S+)\s*$")
+
+
+def measure_import(module_name):
+    """
+    Imports a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module_name (str): The module to import.
+
+    Returns:
+        tuple: (cumulative_us, stdout_text, leaked_modules)
+    """
+    probe = (
+        f"import sys; import {module_name}; "
+        f"print('\\n'.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules), file=sys.stderr)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=SCRIPT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import of {module_name!r} failed:\n{result.stderr}")
+
+    cumulative_us = None
+    leaked = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            # Top-level entry (no indentation) for the module under test
+            if match.group(4) == module_name and match.group(3) == "":
+                cumulative_us = int(match.group(2))
+        elif line.strip() in DEFERRED_MODULES:
+            leaked.append(line.strip())
+
+    return cumulative_us or 0, result.stdout, leaked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time budget check")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per module; the best is kept")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply budgets (slow CI machines)")
+    args = parser.parse_args()
+
+    failures = 0
+    for module_name, budget_us in IMPORT_BUDGETS_US.items():
+        budget_us = int(budget_us * args.scale)
+        best_us = None
+        stdout_text = ""
+        leaked = []
+        for _ in range(max(1, args.runs)):
+            cumulative_us, stdout_text, leaked = measure_import(module_name)
+            best_us = cumulative_us if best_us is None else min(best_us, cumulative_us)
+
+        status = "OK"
+        notes = []
+        if best_us > budget_us:
+            status = "FAIL"
+            notes.append("over budget")
+        if stdout_text.strip():
+            status = "FAIL"
+            notes.append("prints on import")
+        if leaked:
+            status = "FAIL"
+            notes.append(f"imports deferred module(s): {', '.join(leaked)}")
+
+        if status == "FAIL":
+            failures += 1
+        detail = f" ({'; '.join(notes)})" if notes else ""
+        print(f"[{status}] {module_name:<15} {best_us / 1000:8.2f} ms  (budget {budget_us / 1000:.2f} ms){detail}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
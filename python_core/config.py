@@ -8,7 +8,8 @@ import os
 
 """
 Configuration Manager for The Data Librarian.
-Loads settings
+Loads settings explicitly via load_config() / ensure_loaded().
+Importing this module performs no file I/O.
 """
 # Module Constants
 MODULE_WEEDING = "weeding"
@@ -26,7 +27,17 @@ SYSTEM_EXCLUDED_FILES = {
     "config.py", 
     "index.html", 
     "dashboard.html", 
-    "config.json"
+    "config.json",
+    "bench_startup.py",
+    "static_server.py",
+    "weeding_plan.py",
+    "io_throttle.py",
+    "scan_scheduler.py",
+    "bench_scan.py",
+    "path_index.py", "batch_cli.py",
+    "library_index.sqlite3",
+    "library_index.sqlite3-wal",
+    "library_index.sqlite3-shm"
 }
 
 # Defaults used if config.json is missing or incomplete
@@ -35,10 +46,20 @@ DEFAULTS = {
     "DUPLICATE_HOLDING_DIR": "./_DuplicateHoldingBin",
     "LOG_NAME_PREFIX": "_duplicate_log",
     "MOVE_DUPLICATES": False,
+    "DUPLICATE_ACTION": "move",
+    "MOVE_WORKERS": 4,
+    "IO_BYTES_PER_SEC": 0,
+    "IO_OPENS_PER_SEC": 0,
+    "DEVICE_WORKERS": {"hdd": 1, "ssd": 8, "network": 4, "unknown": 2},
+    "DEVICE_TYPE_OVERRIDES": {},
+    "INDEX_PATH": "./_data_librarian/library_index.sqlite3",
     "PORT": 2226,
     "USER_EXCLUDED_FILES": [],
     "PDF_TARGET_CHUNK_MB": 100,
-    "PDF_PAGE_CHUNK_LIMIT": 1000
+    "PDF_PAGE_CHUNK_LIMIT": 1000,
+    "PDF_MEMORY_BUDGET_MB": 0,
+    "PDF_DEDUPLICATE_RESOURCES": False,
+    "PDF_RECOMPRESS_STREAMS": False
 }
 
 # Module-level variables to be exported
@@ -47,13 +68,21 @@ locals().update(DEFAULTS)
 # EXCLUDED_FILES is a derived property
 EXCLUDED_FILES = list(SYSTEM_EXCLUDED_FILES)
 
+# Set once load_config() has run, so callers can load lazily without re-reading the file
+_loaded = False
+
 def load_config():
     """
     Loads configuration from JSON file and updates module globals.
     """
     global EXCLUDED_FOLDERS, DUPLICATE_HOLDING_DIR, LOG_NAME_PREFIX, MOVE_DUPLICATES, PORT
-    global USER_EXCLUDED_FILES, EXCLUDED_FILES
-    global PDF_TARGET_CHUNK_MB, PDF_PAGE_CHUNK_LIMIT
+    global USER_EXCLUDED_FILES, EXCLUDED_FILES, DUPLICATE_ACTION, MOVE_WORKERS
+    global IO_BYTES_PER_SEC, IO_OPENS_PER_SEC, DEVICE_WORKERS, DEVICE_TYPE_OVERRIDES, INDEX_PATH
+    global PDF_TARGET_CHUNK_MB, PDF_PAGE_CHUNK_LIMIT, PDF_MEMORY_BUDGET_MB
+    global PDF_DEDUPLICATE_RESOURCES, PDF_RECOMPRESS_STREAMS
+    global _loaded
+
+    _loaded = True
 
     if os.path.exists(CONFIG_FILE):
         try:
@@ -65,11 +94,21 @@ def load_config():
             DUPLICATE_HOLDING_DIR = data.get("DUPLICATE_HOLDING_DIR", DEFAULTS["DUPLICATE_HOLDING_DIR"])
             LOG_NAME_PREFIX = data.get("LOG_NAME_PREFIX", DEFAULTS["LOG_NAME_PREFIX"])
             MOVE_DUPLICATES = data.get("MOVE_DUPLICATES", DEFAULTS["MOVE_DUPLICATES"])
+            DUPLICATE_ACTION = data.get("DUPLICATE_ACTION", DEFAULTS["DUPLICATE_ACTION"])
+            MOVE_WORKERS = data.get("MOVE_WORKERS", DEFAULTS["MOVE_WORKERS"])
+            IO_BYTES_PER_SEC = data.get("IO_BYTES_PER_SEC", DEFAULTS["IO_BYTES_PER_SEC"])
+            IO_OPENS_PER_SEC = data.get("IO_OPENS_PER_SEC", DEFAULTS["IO_OPENS_PER_SEC"])
+            DEVICE_WORKERS = data.get("DEVICE_WORKERS", DEFAULTS["DEVICE_WORKERS"])
+            DEVICE_TYPE_OVERRIDES = data.get("DEVICE_TYPE_OVERRIDES", DEFAULTS["DEVICE_TYPE_OVERRIDES"])
+            INDEX_PATH = data.get("INDEX_PATH", DEFAULTS["INDEX_PATH"])
             PORT = data.get("PORT", DEFAULTS["PORT"])
             USER_EXCLUDED_FILES = data.get("USER_EXCLUDED_FILES", DEFAULTS["USER_EXCLUDED_FILES"])
             
             PDF_TARGET_CHUNK_MB = data.get("PDF_TARGET_CHUNK_MB", DEFAULTS["PDF_TARGET_CHUNK_MB"])
             PDF_PAGE_CHUNK_LIMIT = data.get("PDF_PAGE_CHUNK_LIMIT", DEFAULTS["PDF_PAGE_CHUNK_LIMIT"])
+            PDF_MEMORY_BUDGET_MB = data.get("PDF_MEMORY_BUDGET_MB", DEFAULTS["PDF_MEMORY_BUDGET_MB"])
+            PDF_DEDUPLICATE_RESOURCES = data.get("PDF_DEDUPLICATE_RESOURCES", DEFAULTS["PDF_DEDUPLICATE_RESOURCES"])
+            PDF_RECOMPRESS_STREAMS = data.get("PDF_RECOMPRESS_STREAMS", DEFAULTS["PDF_RECOMPRESS_STREAMS"])
             
             # Combine System and User excludes
             EXCLUDED_FILES = list(SYSTEM_EXCLUDED_FILES.union(set(USER_EXCLUDED_FILES)))
@@ -82,24 +121,41 @@ def load_config():
         # Setup derived defaults
         EXCLUDED_FILES = list(SYSTEM_EXCLUDED_FILES)
 
-def save_config(new_config):
+def read_config_file():
     """
-    Updates config.json with new values.
-    Args:
-        new_config (dict): Dictionary of settings to update.
+    Returns the raw contents of config.json, including sections this backend does not use
+    (e.g. the frontend's "data_librarian" block). Empty if the file is missing or unreadable.
     """
-    current_data = DEFAULTS.copy()
     if os.path.exists(CONFIG_FILE):
         try:
             with open(CONFIG_FILE, 'r') as f:
-                current_data.update(json.load(f))
-        except:
-            pass
-            
-    current_data.update(new_config)
-    
-    # Ensure generated keys are not saved if they crept in?
-    # No, new_config comes from the UI which should map clearly.
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
+        except Exception as e:
+            print(f"Error reading {CONFIG_FILE}: {e}")
+    return {}
+
+def _merge(target, updates):
+    """
+    Merges updates into target. Nested sections are merged key by key, so a partial
+    section only changes what it names; backend settings (DEFAULTS keys) are replaced whole.
+    """
+    for key, value in updates.items():
+        if key not in DEFAULTS and isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+def save_config(new_config):
+    """
+    Updates config.json with new values.
+    Only the keys given are written; settings left at their defaults stay out of the file.
+    Args:
+        new_config (dict): Partial config object to merge in.
+    """
+    current_data = read_config_file()
+    _merge(current_data, new_config)
 
     try:
         with open(CONFIG_FILE, 'w') as f:
@@ -111,5 +167,10 @@ def save_config(new_config):
         print(f"Error saving config: {e}")
         return False
 
-# Load on import
-load_config()
\ No newline at end of file
+def ensure_loaded():
+    """
+    Loads the configuration on first use only.
+    Subsequent calls are no-ops; use load_config() to force a re-read.
+    """
+    if not _loaded:
+        load_config()
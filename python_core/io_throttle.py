@@ -0,0 +1,177 @@
+"""
+I/O throttling for The Data Librarian.
+Token buckets on bytes/sec and opens/sec, shared by every background job
+(hashing, PDF reads) so a long scan uses a fixed share of disk bandwidth.
+Limits can be changed while a job is running.
+Author: Jesse Tudela
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Classic token bucket. A rate of 0 means unlimited.
+    Requests larger than the bucket go into debt and wait it off, so any size is accepted.
+    Waiters are served in order and wake when the rate changes, so a new limit (or none)
+    applies to reads that are already waiting.
+    """
+
+    def __init__(self, rate: float = 0, burst_seconds: float = 1.0):
+        self._cond = threading.Condition()
+        self.burst_seconds = burst_seconds
+        self.rate = 0.0
+        # Running totals: tokens handed out and tokens earned. A waiter may go once
+        # `granted` reaches the total at the time of its own request.
+        self.taken = 0.0
+        self.granted = 0.0
+        self.last = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate: float) -> None:
+        with self._cond:
+            self._refill()
+            self.rate = max(0.0, float(rate or 0))
+            if self.rate <= 0:
+                # Unlimited: forgive any debt so waiting readers go now
+                self.granted = self.taken
+            else:
+                # Cap the saved-up allowance at the new burst size; keep any outstanding debt
+                self.granted = min(self.granted, self.taken + self.rate * self.burst_seconds)
+            self._cond.notify_all()
+
+    def acquire(self, amount: float) -> float:
+        """
+        Takes amount tokens, waiting until they are available.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        with self._cond:
+            if self.rate <= 0:
+                return 0.0
+            self._refill()
+            self.taken += amount
+            due = self.taken
+            started = time.monotonic()
+            waited = False
+            while self.rate > 0:
+                self._refill()
+                shortfall = due - self.granted
+                if shortfall <= 0:
+                    break
+                # set_rate wakes us early; otherwise sleep until the debt should be paid
+                self._cond.wait(shortfall / self.rate)
+                waited = True
+            return time.monotonic() - started if waited else 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self.granted = min(self.taken + self.rate * self.burst_seconds, self.granted + (now - self.last) * self.rate)
+        self.last = now
+
+
+class IOThrottle:
+    """
+    Byte and file-open rate limits plus counters for status output.
+    """
+
+    def __init__(self, bytes_per_sec: float = 0, opens_per_sec: float = 0):
+        self._bytes = TokenBucket()
+        self._opens = TokenBucket()
+        self._lock = threading.Lock()
+        self.bytes_read = 0
+        self.files_opened = 0
+        self.wait_seconds = 0.0
+        self.last_wait_at = 0.0
+        self.set_limits(bytes_per_sec, opens_per_sec)
+
+    def set_limits(self, bytes_per_sec: float, opens_per_sec: float) -> None:
+        """
+        Changes the limits; takes effect immediately, including for running jobs.
+
+        Args:
+            bytes_per_sec (float): Read bandwidth cap, 0 for unlimited.
+            opens_per_sec (float): File-open rate cap, 0 for unlimited.
+        """
+        self._bytes.set_rate(bytes_per_sec)
+        self._opens.set_rate(opens_per_sec)
+
+    def acquire_open(self) -> None:
+        self._account(self._opens.acquire(1), opens=1)
+
+    def acquire_bytes(self, amount: int) -> None:
+        self._account(self._bytes.acquire(amount), nbytes=amount)
+
+    def status(self) -> dict:
+        """
+        Returns the current limits and counters, for the status endpoints.
+        """
+        with self._lock:
+            return {
+                "bytes_per_sec": self._bytes.rate,
+                "opens_per_sec": self._opens.rate,
+                "active": self._bytes.rate > 0 or self._opens.rate > 0,
+                # True if a reader had to wait within the last second
+                "throttling": time.monotonic() - self.last_wait_at < 1.0,
+                "bytes_read": self.bytes_read,
+                "files_opened": self.files_opened,
+                "wait_seconds": round(self.wait_seconds, 3),
+            }
+
+    def _account(self, waited, nbytes=0, opens=0):
+        with self._lock:
+            self.bytes_read += nbytes
+            self.files_opened += opens
+            if waited > 0:
+                self.wait_seconds += waited
+                self.last_wait_at = time.monotonic()
+
+
+class ThrottledFile:
+    """
+    Wraps a binary file object so every read is charged to an IOThrottle.
+    Everything else (seek, tell, mode, ...) is passed through.
+    """
+
+    def __init__(self, raw, throttle: IOThrottle):
+        self._raw = raw
+        self._throttle = throttle
+
+    def read(self, size=-1):
+        data = self._raw.read(size)
+        self._throttle.acquire_bytes(len(data))
+        return data
+
+    def readline(self, size=-1):
+        data = self._raw.readline(size)
+        self._throttle.acquire_bytes(len(data))
+        return data
+
+    def readinto(self, buffer):
+        count = self._raw.readinto(buffer)
+        self._throttle.acquire_bytes(count or 0)
+        return count
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._raw.close()
+
+
+def open_throttled(path: str, throttle: IOThrottle) -> ThrottledFile:
+    """
+    Opens a file for binary reading, charging the open and every read to throttle.
+    """
+    throttle.acquire_open()
+    return ThrottledFile(open(path, "rb"), throttle)
+
+
+# Process-wide scheduler shared by all jobs
+IO_THROTTLE = IOThrottle()
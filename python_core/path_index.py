@@ -0,0 +1,585 @@
+"""
+Persistent path search index for The Data Librarian.
+Keeps every file's relative path (plus size/mtime) under the library root in
+SQLite, with an FTS5 trigram index for fast substring search, and recursive
+per-directory rollups (bytes, file count, reclaimable duplicate bytes).
+Built during scans and updated incrementally as files are seen, moved or removed.
+Author: Jesse Tudela
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+# Rows buffered before a write transaction is committed
+BATCH_SIZE = 2000
+MAX_PAGE_SIZE = 500
+# Matches fetched per search before ranking. Ranking and `total` cover at most this many
+# (or page * page_size if more), so a query costs about the same on any size of index.
+SEARCH_CANDIDATES = 2000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    ctime REAL NOT NULL,
+    scan_id INTEGER NOT NULL DEFAULT 0,
+    dup INTEGER NOT NULL DEFAULT 0,
+    parent TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Recursive totals per directory ('' is the root, whose parent is NULL). `mtime` is the directory's
+# own mtime when its entries were last synced, so unchanged directories can be skipped.
+_DIRS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    files INTEGER NOT NULL DEFAULT 0,
+    dup_bytes INTEGER NOT NULL DEFAULT 0,
+    mtime REAL
+);
+"""
+
+# External-content FTS table: the text lives once in `files`, triggers keep the index in step.
+# Only path changes touch the FTS index; size/mtime refreshes are plain row updates.
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+    path, content='files', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS files_ai AFTER INSERT ON files BEGIN
+    INSERT INTO files_fts(rowid, path) VALUES (new.id, new.path);
+END;
+CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN
+    INSERT INTO files_fts(files_fts, rowid, path) VALUES ('delete', old.id, old.path);
+END;
+CREATE TRIGGER IF NOT EXISTS files_au AFTER UPDATE OF path ON files BEGIN
+    INSERT INTO files_fts(files_fts, rowid, path) VALUES ('delete', old.id, old.path);
+    INSERT INTO files_fts(rowid, path) VALUES (new.id, new.path);
+END;
+"""
+
+
+def _parent_of(rel_path):
+    """
+    Returns the folder part of a root-relative path ('' for files directly in the root).
+    """
+    return rel_path.rsplit("/", 1)[0] if "/" in rel_path else ""
+
+
+def _add_to_ancestors(deltas, rel_path, delta):
+    """
+    Adds a (bytes, files, dup_bytes) delta to every directory containing rel_path, including the root ('').
+    """
+    parts = rel_path.split("/")[:-1]
+    prefixes = [""] + ["/".join(parts[:i + 1]) for i in range(len(parts))]
+    for prefix in prefixes:
+        current = deltas.get(prefix, (0, 0, 0))
+        deltas[prefix] = (current[0] + delta[0], current[1] + delta[1], current[2] + delta[2])
+
+
+class PathIndex:
+    """
+    SQLite-backed index of relative file paths under a root directory.
+    Safe to share between the scan thread and request handlers.
+    """
+
+    def __init__(self, db_path: str, root: str):
+        """
+        Args:
+            db_path (str): Location of the SQLite database (created if missing).
+            root (str): Library root; indexed paths are stored relative to it with '/' separators.
+        """
+        self.db_path = os.path.abspath(db_path)
+        self.root = os.path.abspath(root)
+        self._lock = threading.RLock()
+        self._pending = []
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        # Generous busy timeout: parallel batch runs may share one index file
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(files)")]
+        if "dup" not in columns:
+            # Index created before duplicate tracking
+            self._conn.execute("ALTER TABLE files ADD COLUMN dup INTEGER NOT NULL DEFAULT 0")
+        if "parent" not in columns:
+            # Index created before directory listings; SQLite has no rfind, so fill it in here
+            self._conn.execute("ALTER TABLE files ADD COLUMN parent TEXT NOT NULL DEFAULT ''")
+            rows = self._conn.execute("SELECT id, path FROM files").fetchall()
+            self._conn.executemany("UPDATE files SET parent = ? WHERE id = ?",
+                                   [(_parent_of(path), row_id) for row_id, path in rows])
+        # Direct children of a folder, for sync_directory
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_parent ON files(parent)")
+        # Exact and prefix file-name matches, which search ranks first
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_name ON files(lower(name))")
+        has_dirs = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'dirs'").fetchone()
+        self._conn.executescript(_DIRS_SCHEMA)
+        if not has_dirs:
+            self._rebuild_rollups_locked()
+        elif "parent" not in [row[1] for row in self._conn.execute("PRAGMA table_info(dirs)")]:
+            # Rollups created before subfolder tracking
+            self._conn.execute("ALTER TABLE dirs ADD COLUMN parent TEXT")
+            rows = self._conn.execute("SELECT path FROM dirs WHERE path != ''").fetchall()
+            self._conn.executemany("UPDATE dirs SET parent = ? WHERE path = ?",
+                                   [(_parent_of(path), path) for (path,) in rows])
+        # Direct subfolders of a folder, for sync_directory
+        self._conn.execute("CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent)")
+        try:
+            self._conn.executescript(_FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # SQLite without FTS5 or the trigram tokenizer (< 3.34): fall back to scanning
+            self.has_fts = False
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'scan_id'").fetchone()
+        self._scan_id = int(row[0]) if row else 0
+
+    # --- Updates ---
+
+    def relative_path(self, path: str) -> Optional[str]:
+        """
+        Returns path relative to the root with '/' separators, or None if it lies outside the root.
+        """
+        try:
+            rel = os.path.relpath(os.path.abspath(path), self.root)
+        except ValueError:
+            # Different drive on Windows
+            return None
+        if rel == os.curdir or rel.startswith(os.pardir):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def begin_scan(self) -> int:
+        """
+        Starts a scan generation. Files recorded during it are tagged with the returned id,
+        so prune() can later drop entries the scan did not see.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'scan_id'").fetchone()
+            scan_id = int(row[0]) + 1 if row else 1
+            self._conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('scan_id', ?)", (str(scan_id),))
+            self._conn.commit()
+            self._scan_id = scan_id
+            return scan_id
+
+    def add(self, path: str, st: Optional[os.stat_result] = None, duplicate: bool = False) -> None:
+        """
+        Records (or refreshes) one file. Writes are batched; call flush() when done.
+
+        Args:
+            path (str): Path of the file.
+            st (Optional[os.stat_result]): Stat result if the caller already has one.
+            duplicate (bool): The file is a redundant copy; its size counts as reclaimable.
+        """
+        rel = self.relative_path(path)
+        if rel is None:
+            return
+        if st is None:
+            st = os.stat(path)
+        with self._lock:
+            self._pending.append((rel, _parent_of(rel), rel.rsplit("/", 1)[-1], st.st_size, st.st_mtime,
+                                  st.st_ctime, self._scan_id, 1 if duplicate else 0))
+            if len(self._pending) >= BATCH_SIZE:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def remove(self, path: str) -> None:
+        rel = self.relative_path(path)
+        if rel is None:
+            return
+        with self._lock:
+            self._flush_locked()
+            self._delete_where_locked("path = ?", (rel,))
+            self._conn.commit()
+
+    def refresh_paths(self, paths: Iterable[str], duplicate: Optional[bool] = None) -> None:
+        """
+        Re-stats the given files, updating entries that exist and removing ones that are gone.
+        Used after moves so the index does not need a full rescan.
+
+        Args:
+            paths (iterable): Paths to refresh.
+            duplicate (Optional[bool]): New duplicate flag for files that exist; None keeps the stored one.
+        """
+        for path in paths:
+            rel = self.relative_path(path)
+            if rel is None:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                self.remove(path)
+                continue
+            flag = duplicate
+            if flag is None:
+                with self._lock:
+                    row = self._conn.execute("SELECT dup FROM files WHERE path = ?", (rel,)).fetchone()
+                flag = bool(row and row[0])
+            self.add(path, st, duplicate=flag)
+        self.flush()
+
+    def sync_directory(self, directory: str, excluded_files=(), excluded_folders=()) -> bool:
+        """
+        Brings one directory's direct entries in line with disk, unless its mtime is unchanged
+        since the last sync (no entries added, removed or renamed). Rollups follow automatically.
+        Only folders a scan has already covered are synced; syncing just the direct files of
+        an unscanned folder would give it partial totals.
+
+        Subfolders that are gone (deleted, or renamed away) are dropped with everything under
+        them. Subfolders that are new (created, or renamed in) are walked once by index_tree,
+        so a folder renamed within the library costs one walk of that folder, not a rescan.
+
+        Args:
+            directory (str): Directory to sync.
+            excluded_files (iterable): File names that are never indexed.
+            excluded_folders (iterable): Folder names that are never indexed.
+
+        Returns:
+            bool: True if the directory was re-listed, False if it was current or never scanned.
+        """
+        rel = self.relative_path(directory)
+        if rel is None:
+            if os.path.abspath(directory) != self.root:
+                return False
+            rel = ""
+        dir_mtime = os.stat(directory).st_mtime
+
+        with self._lock:
+            row = self._conn.execute("SELECT mtime FROM dirs WHERE path = ?", (rel,)).fetchone()
+            if row is None or row[0] == dir_mtime:
+                return False
+            self._flush_locked()
+            known = {name: (path, size, mtime, dup) for path, name, size, mtime, dup in self._conn.execute(
+                "SELECT path, name, size, mtime, dup FROM files WHERE parent = ?", (rel,))}
+            known_dirs = {path.rsplit("/", 1)[-1]: path for (path,) in self._conn.execute(
+                "SELECT path FROM dirs WHERE parent = ?", (rel,))}
+
+        seen = set()
+        seen_dirs = set()
+        new_dirs = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        # Like a scan: excluded and symlinked folders are not indexed
+                        if entry.name not in excluded_folders and not entry.is_symlink():
+                            seen_dirs.add(entry.name)
+                            if entry.name not in known_dirs:
+                                new_dirs.append(entry.path)
+                        continue
+                    if entry.name in excluded_files:
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                seen.add(entry.name)
+                old = known.get(entry.name)
+                if old is None or old[1] != st.st_size or old[2] != st.st_mtime:
+                    self.add(entry.path, st, duplicate=bool(old and old[3]))
+
+        with self._lock:
+            self._flush_locked()
+            for name, (path, _size, _mtime, _dup) in known.items():
+                if name not in seen:
+                    self._delete_where_locked("path = ?", (path,))
+            for name, path in known_dirs.items():
+                if name not in seen_dirs:
+                    self._delete_tree_locked(path)
+            self._conn.execute("UPDATE dirs SET mtime = ? WHERE path = ?", (dir_mtime, rel))
+            self._conn.commit()
+
+        for path in new_dirs:
+            self.index_tree(path, excluded_files, excluded_folders)
+        return True
+
+    def index_tree(self, directory: str, excluded_files=(), excluded_folders=()) -> int:
+        """
+        Walks a folder the index has no rollups for and records every file under it, plus a
+        rollup row (with its mtime) for every folder, including empty ones, so sync_directory
+        keeps the whole tree current from then on.
+
+        Args:
+            directory (str): Folder under the root to index.
+            excluded_files (iterable): File names that are never indexed.
+            excluded_folders (iterable): Folder names that are never descended into.
+
+        Returns:
+            int: Number of files recorded.
+        """
+        folders = []
+        count = 0
+        for current, subdirs, names in os.walk(directory):
+            subdirs[:] = [name for name in subdirs if name not in excluded_folders]
+            rel = self.relative_path(current)
+            if rel is None:
+                continue
+            try:
+                folders.append((rel, _parent_of(rel), os.stat(current).st_mtime))
+            except OSError:
+                continue
+            for name in names:
+                if name in excluded_files:
+                    continue
+                path = os.path.join(current, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                self.add(path, st)
+                count += 1
+
+        with self._lock:
+            self._flush_locked()
+            self._conn.executemany(
+                "INSERT INTO dirs(path, parent, mtime) VALUES (?, ?, ?) ON CONFLICT(path) DO UPDATE SET mtime = excluded.mtime",
+                folders,
+            )
+            self._conn.commit()
+        return count
+
+    def prune(self, scan_dir: str, scan_id: int) -> int:
+        """
+        Deletes entries under scan_dir that the given scan did not see (deleted or moved away).
+        Only call this after a scan completed; a cancelled scan has not seen everything.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            self._flush_locked()
+            prefix = self.relative_path(scan_dir)
+            if prefix is None and os.path.abspath(scan_dir) != self.root:
+                return 0
+            if prefix is None:
+                removed = self._delete_where_locked("scan_id != ?", (scan_id,))
+            else:
+                removed = self._delete_where_locked(
+                    "scan_id != ? AND substr(path, 1, ?) = ?",
+                    (scan_id, len(prefix) + 1, prefix + "/"),
+                )
+            self._conn.commit()
+            return removed
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM files").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+
+        # Previous (size, dup) of each row, so rollups can be adjusted by the difference
+        previous = {}
+        paths = list({row[0] for row in self._pending})
+        for i in range(0, len(paths), 500):
+            chunk = paths[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for path, size, dup in self._conn.execute(
+                    f"SELECT path, size, dup FROM files WHERE path IN ({placeholders})", chunk):
+                previous[path] = (size, dup)
+
+        deltas = {}
+        for rel, _parent, _name, size, _mtime, _ctime, _scan_id, dup in self._pending:
+            old = previous.get(rel)
+            if old is None:
+                delta = (size, 1, size * dup)
+            else:
+                delta = (size - old[0], 0, size * dup - old[0] * old[1])
+            previous[rel] = (size, dup)
+            if delta != (0, 0, 0):
+                _add_to_ancestors(deltas, rel, delta)
+
+        self._conn.executemany(
+            "INSERT INTO files(path, parent, name, size, mtime, ctime, scan_id, dup) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, "
+            "ctime = excluded.ctime, scan_id = excluded.scan_id, dup = excluded.dup",
+            self._pending,
+        )
+        self._apply_deltas_locked(deltas)
+        self._conn.commit()
+        self._pending = []
+
+    def _delete_where_locked(self, where_sql, params) -> int:
+        """
+        Deletes file rows matching a condition and subtracts them from every ancestor's rollup.
+        """
+        deltas = {}
+        count = 0
+        for path, size, dup in self._conn.execute(f"SELECT path, size, dup FROM files WHERE {where_sql}", params):
+            _add_to_ancestors(deltas, path, (-size, -1, -size * dup))
+            count += 1
+        if count:
+            self._conn.execute(f"DELETE FROM files WHERE {where_sql}", params)
+            self._apply_deltas_locked(deltas)
+        return count
+
+    def _delete_tree_locked(self, rel_dir):
+        """
+        Drops every file under a folder (from files and all rollups) and the folder's own rollup rows.
+        A range on the path index finds them; '0' is the character right after '/'.
+        """
+        low, high = rel_dir + "/", rel_dir + "0"
+        self._delete_where_locked("path >= ? AND path < ?", (low, high))
+        self._conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (rel_dir, low, high))
+
+    def _apply_deltas_locked(self, deltas):
+        if not deltas:
+            return
+        self._conn.executemany(
+            "INSERT INTO dirs(path, parent, bytes, files, dup_bytes) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET bytes = bytes + excluded.bytes, "
+            "files = files + excluded.files, dup_bytes = dup_bytes + excluded.dup_bytes",
+            [(path, _parent_of(path) if path else None, d[0], d[1], d[2]) for path, d in deltas.items()],
+        )
+
+    def _rebuild_rollups_locked(self):
+        """
+        Recomputes every directory rollup from the files table (used once, on upgrade).
+        """
+        deltas = {}
+        for path, size, dup in self._conn.execute("SELECT path, size, dup FROM files"):
+            _add_to_ancestors(deltas, path, (size, 1, size * dup))
+        self._conn.execute("DELETE FROM dirs")
+        self._apply_deltas_locked(deltas)
+        self._conn.commit()
+
+    # --- Directory rollups ---
+
+    def get_dir_stats(self, directories: Iterable[str]) -> dict:
+        """
+        Returns recursive rollups for the given directories.
+
+        Args:
+            directories (iterable): Directory paths.
+
+        Returns:
+            dict: Root-relative path -> {"bytes": int, "files": int, "dup_bytes": int}.
+                  Directories never indexed are absent.
+        """
+        rels = []
+        for directory in directories:
+            rel = self.relative_path(directory)
+            if rel is None and os.path.abspath(directory) == self.root:
+                rel = ""
+            if rel is not None:
+                rels.append(rel)
+
+        stats = {}
+        with self._lock:
+            self._flush_locked()
+            for i in range(0, len(rels), 500):
+                chunk = rels[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for path, total_bytes, files, dup_bytes in self._conn.execute(
+                        f"SELECT path, bytes, files, dup_bytes FROM dirs WHERE path IN ({placeholders})", chunk):
+                    stats[path] = {"bytes": total_bytes, "files": files, "dup_bytes": dup_bytes}
+        return stats
+
+    # --- Queries ---
+
+    def search(self, query: str, page: int = 1, page_size: int = 50) -> dict:
+        """
+        Finds files whose relative path contains every whitespace-separated term (case-insensitive).
+        Exact and prefix file-name matches rank first, then shorter paths.
+
+        Only a bounded set of candidates is ranked: file names starting with the query (from the
+        name index) plus the first substring matches (from the trigram index, or a scan for terms
+        under 3 characters, which stops once enough are found). When that set is full, `total`
+        is a lower bound and `total_capped` is True.
+
+        Args:
+            query (str): Search text.
+            page (int): 1-based page number.
+            page_size (int): Results per page (capped at MAX_PAGE_SIZE).
+
+        Returns:
+            dict: {"results": [...], "total": int, "total_capped": bool, "page": int, "page_size": int, "took_ms": float}
+        """
+        started = time.perf_counter()
+        page = max(1, int(page))
+        page_size = min(max(1, int(page_size)), MAX_PAGE_SIZE)
+        terms = [t for t in query.split() if t]
+        if not terms:
+            return {"results": [], "total": 0, "total_capped": False, "page": page, "page_size": page_size,
+                    "took_ms": 0.0}
+
+        lowered = query.strip().lower()
+        limit = max(SEARCH_CANDIDATES, page * page_size)
+        fts_terms = [t for t in terms if len(t) >= 3] if self.has_fts else []
+        scan_terms = [t for t in terms if t not in fts_terms]
+
+        columns = "files.id, files.path, files.name, files.size, files.mtime, files.ctime"
+        # A name starting with the whole query contains every term, so no further filter is needed
+        sources = [(f"SELECT {columns} FROM files WHERE lower(files.name) >= ? AND lower(files.name) < ?",
+                    [lowered, lowered + "\U0010ffff"])]
+        if fts_terms:
+            source = "files_fts JOIN files ON files.id = files_fts.rowid"
+            where = ["files_fts MATCH ?"]
+            params = [" AND ".join('"' + t.replace('"', '""') + '"' for t in fts_terms)]
+        else:
+            source = "files"
+            where = []
+            params = []
+        for term in scan_terms:
+            where.append("instr(lower(files.path), ?) > 0")
+            params.append(term.lower())
+        sources.append((f"SELECT {columns} FROM {source} WHERE {' AND '.join(where)}", params))
+
+        candidates = {}
+        capped = False
+        with self._lock:
+            self._flush_locked()
+            for sql, params in sources:
+                rows = self._conn.execute(f"{sql} LIMIT ?", params + [limit]).fetchall()
+                capped = capped or len(rows) >= limit
+                for row in rows:
+                    candidates[row[0]] = row
+
+        def rank(row):
+            name = row[2].lower()
+            if name == lowered:
+                tier = 0
+            elif name.startswith(lowered):
+                tier = 1
+            elif lowered in name:
+                tier = 2
+            else:
+                tier = 3
+            return tier, len(row[1]), row[1]
+
+        ranked = sorted(candidates.values(), key=rank)
+        offset = (page - 1) * page_size
+        results = [
+            {"path": path, "name": name, "size": size, "mtime": mtime, "ctime": ctime}
+            for _id, path, name, size, mtime, ctime in ranked[offset:offset + page_size]
+        ]
+        return {
+            "results": results,
+            "total": len(ranked),
+            "total_capped": capped,
+            "page": page,
+            "page_size": page_size,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
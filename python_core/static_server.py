@@ -0,0 +1,426 @@
+"""
+Static file layer for The Data Librarian web interface.
+Caches templates and small assets in memory (invalidated by mtime/size),
+serves precompressed .br/.gz variants, answers conditional requests with 304,
+and streams large files with sendfile.
+Author: Jesse Tudela
+"""
+
+import os
+import gzip
+import hashlib
+import mimetypes
+import re
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Optional
+
+# Files larger than this are streamed with sendfile instead of cached in memory
+MAX_CACHED_FILE_BYTES = 1 * 1024 * 1024
+# Upper bound for the whole in-memory cache
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+# Below this size, on-the-fly gzip is not worth the CPU
+MIN_GZIP_BYTES = 1024
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+)
+
+# Next.js export puts content-hashed assets here; they never change for a given URL
+IMMUTABLE_PREFIX = "/_next/static/"
+
+
+class StaticEntry:
+    """
+    One cached file. `data`/`gzip_data` are None for large files, which are
+    streamed from disk instead.
+    """
+
+    def __init__(self, path, mtime, size, content_type, etag, data=None, gzip_data=None, variants=None):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.content_type = content_type
+        self.etag = etag
+        self.data = data
+        self.gzip_data = gzip_data
+        # encoding -> (path, size) of precompressed sibling files (".br", ".gz")
+        self.variants = variants or {}
+
+    def cached_bytes(self):
+        return len(self.data or b"") + len(self.gzip_data or b"")
+
+
+class StaticCache:
+    """
+    Thread-safe in-memory cache of static files and templates keyed by absolute path.
+    An entry is reused only while the file's (mtime, size) on disk are unchanged.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, max_file_bytes=MAX_CACHED_FILE_BYTES):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._entries = {}
+        self._templates = {}
+        self._renders = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[StaticEntry]:
+        """
+        Returns the cached entry for a file, (re)loading it if it changed on disk.
+
+        Args:
+            path (str): Absolute path of the file.
+
+        Returns:
+            Optional[StaticEntry]: The entry, or None if the file does not exist.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry.mtime == st.st_mtime and entry.size == st.st_size:
+                return entry
+
+        entry = self._load(path, st)
+
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old:
+                self._total_bytes -= old.cached_bytes()
+            # Simple bound: drop everything when full; the working set (UI assets) is small
+            if self._total_bytes + entry.cached_bytes() > self.max_bytes:
+                self._entries.clear()
+                self._templates.clear()
+                self._renders.clear()
+                self._total_bytes = 0
+            self._entries[path] = entry
+            self._total_bytes += entry.cached_bytes()
+        return entry
+
+    def get_template(self, path: str, names):
+        """
+        Returns a template pre-split on its `{placeholder}` markers, cached until the file changes.
+
+        Args:
+            path (str): Absolute path of the template.
+            names (iterable): Placeholder names to split on.
+
+        Returns:
+            Optional[list]: Alternating literal text and placeholder names, or None if missing.
+        """
+        entry = self.get(path)
+        if entry is None:
+            return None
+
+        names = tuple(names)
+        with self._lock:
+            cached = self._templates.get(path)
+            if cached and cached[0] == (entry.etag, names):
+                return cached[1]
+
+        data = entry.data if entry.data is not None else _read_file(path)
+        parts = _split_template(data.decode("utf-8"), names)
+        with self._lock:
+            self._templates[path] = ((entry.etag, names), parts)
+        return parts
+
+    def render(self, path: str, values: dict) -> Optional[bytes]:
+        """
+        Renders a template to UTF-8 bytes. The last render per template is memoised,
+        so repeated requests with unchanged values skip the work entirely.
+
+        Args:
+            path (str): Absolute path of the template.
+            values (dict): Placeholder name -> replacement string.
+
+        Returns:
+            Optional[bytes]: The rendered body, or None if the template is missing.
+        """
+        parts = self.get_template(path, sorted(values))
+        if parts is None:
+            return None
+
+        key = (id(parts), tuple(sorted(values.items())))
+        with self._lock:
+            last = self._renders.get(path)
+            if last and last[0] == key:
+                return last[1]
+
+        body = render_template(parts, values).encode("utf-8")
+        with self._lock:
+            self._renders[path] = (key, body, None)
+        return body
+
+    def render_gzip(self, path: str, body: bytes) -> bytes:
+        """
+        Returns body gzip-compressed. Compressed once per memoised render of path;
+        any other body is compressed on the spot.
+        """
+        with self._lock:
+            last = self._renders.get(path)
+            if last and last[1] is body and last[2] is not None:
+                return last[2]
+
+        compressed = gzip.compress(body, compresslevel=6, mtime=0)
+        with self._lock:
+            last = self._renders.get(path)
+            if last and last[1] is body:
+                self._renders[path] = (last[0], body, compressed)
+        return compressed
+
+    def _load(self, path, st):
+        content_type = guess_type(path)
+        etag = f'"{int(st.st_mtime_ns):x}-{st.st_size:x}"'
+        variants = {}
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            try:
+                vst = os.stat(path + suffix)
+                if vst.st_mtime >= st.st_mtime:
+                    variants[encoding] = (path + suffix, vst.st_size)
+            except OSError:
+                pass
+
+        data = None
+        gzip_data = None
+        if st.st_size <= self.max_file_bytes:
+            data = _read_file(path)
+            if ("gzip" not in variants and len(data) >= MIN_GZIP_BYTES
+                    and content_type.startswith(COMPRESSIBLE_TYPES)):
+                gzip_data = gzip.compress(data, compresslevel=6, mtime=0)
+                if len(gzip_data) >= len(data):
+                    gzip_data = None
+
+        return StaticEntry(path, st.st_mtime, st.st_size, content_type, etag, data, gzip_data, variants)
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _split_template(text, names):
+    """
+    Splits text on `{name}` placeholders for the given names only,
+    so unrelated braces (CSS/JS) are left untouched.
+    Even indices are literal text, odd indices are placeholder names.
+    """
+    if not names:
+        return [text]
+    pattern = r"\{(" + "|".join(re.escape(n) for n in names) + r")\}"
+    return re.split(pattern, text)
+
+
+def render_template(parts, values: dict) -> str:
+    """
+    Fills a pre-split template.
+
+    Args:
+        parts (list): Output of StaticCache.get_template().
+        values (dict): Placeholder name -> replacement string.
+
+    Returns:
+        str: The rendered text.
+    """
+    out = []
+    for i, part in enumerate(parts):
+        out.append(values[part] if i % 2 else part)
+    return "".join(out)
+
+
+def guess_type(path: str) -> str:
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def make_etag(data: bytes) -> str:
+    return '"' + hashlib.sha1(data).hexdigest()[:20] + '"'
+
+
+def _encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    if not encoding:
+        return etag
+    return etag[:-1] + "-" + encoding + '"'
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def is_not_modified(headers, etag: str, mtime: Optional[float] = None) -> bool:
+    """
+    Evaluates If-None-Match / If-Modified-Since against a resource.
+
+    Args:
+        headers: The request headers.
+        etag (str): Current ETag of the resource.
+        mtime (Optional[float]): Current modification time, if meaningful.
+
+    Returns:
+        bool: True if a 304 Not Modified response should be sent.
+    """
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags or ("W/" + etag) in tags
+
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since and mtime is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= int(since)
+    return False
+
+
+def accepted_encodings(headers) -> set:
+    """
+    Parses Accept-Encoding into a set of encodings with a non-zero q-value.
+    """
+    accepted = set()
+    for item in (headers.get("Accept-Encoding") or "").split(","):
+        token, _, params = item.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(token)
+    return accepted
+
+
+def cache_control_for(url_path: str) -> str:
+    if url_path.startswith(IMMUTABLE_PREFIX):
+        return "public, max-age=31536000, immutable"
+    # Revalidate every time; ETag makes that a cheap 304
+    return "no-cache"
+
+
+def send_entry(handler, entry: StaticEntry, url_path: str, head_only: bool = False) -> None:
+    """
+    Writes a cached static file to an http.server request handler, choosing the
+    best encoding the client accepts and answering conditional requests with 304.
+
+    Args:
+        handler: The BaseHTTPRequestHandler serving the request.
+        entry (StaticEntry): The file to send.
+        url_path (str): Request path (used for Cache-Control).
+        head_only (bool): Send headers only (HEAD request).
+    """
+    cache_control = cache_control_for(url_path)
+    accepted = accepted_encodings(handler.headers)
+    encoding = None
+    body = entry.data
+    file_path = entry.path
+    length = entry.size
+
+    if "br" in accepted and "br" in entry.variants:
+        encoding = "br"
+        file_path, length = entry.variants["br"]
+        body = None
+    elif "gzip" in accepted and "gzip" in entry.variants:
+        encoding = "gzip"
+        file_path, length = entry.variants["gzip"]
+        body = None
+    elif "gzip" in accepted and entry.gzip_data is not None:
+        encoding = "gzip"
+        body = entry.gzip_data
+        length = len(body)
+
+    # Each encoding is a distinct representation and needs its own strong ETag
+    etag = _encoded_etag(entry.etag, encoding)
+
+    if is_not_modified(handler.headers, etag, entry.mtime):
+        handler.send_response(304)
+        handler.send_header("ETag", etag)
+        handler.send_header("Cache-Control", cache_control)
+        handler.end_headers()
+        return
+
+    handler.send_response(200)
+    handler.send_header("Content-Type", entry.content_type)
+    handler.send_header("Content-Length", str(length))
+    handler.send_header("ETag", etag)
+    handler.send_header("Last-Modified", http_date(entry.mtime))
+    handler.send_header("Cache-Control", cache_control)
+    if entry.variants or entry.gzip_data is not None:
+        handler.send_header("Vary", "Accept-Encoding")
+    if encoding:
+        handler.send_header("Content-Encoding", encoding)
+    handler.end_headers()
+
+    if head_only:
+        return
+
+    if body is not None:
+        handler.wfile.write(body)
+        return
+
+    with open(file_path, "rb") as f:
+        if length <= MAX_CACHED_FILE_BYTES:
+            handler.wfile.write(f.read())
+            return
+        handler.wfile.flush()
+        try:
+            # Zero-copy where the platform supports it
+            handler.connection.sendfile(f)
+        except (AttributeError, OSError, ValueError):
+            f.seek(0)
+            while True:
+                block = f.read(256 * 1024)
+                if not block:
+                    break
+                handler.wfile.write(block)
+
+
+def send_rendered(handler, body: bytes, content_type: str, head_only: bool = False,
+                  compress: Optional[Callable[[bytes], bytes]] = None) -> None:
+    """
+    Writes a dynamically rendered page with an ETag derived from its content,
+    so unchanged renders still produce a 304. Compresses with gzip when accepted.
+
+    Args:
+        handler: The BaseHTTPRequestHandler serving the request.
+        body (bytes): The rendered body.
+        content_type (str): Content-Type header value.
+        head_only (bool): Send headers only (HEAD request).
+        compress (Optional[Callable]): Returns the gzip body, e.g. StaticCache.render_gzip
+            to reuse the compression of a memoised render.
+    """
+    encoding = None
+    if "gzip" in accepted_encodings(handler.headers) and len(body) >= MIN_GZIP_BYTES:
+        encoding = "gzip"
+    etag = _encoded_etag(make_etag(body), encoding)
+
+    if is_not_modified(handler.headers, etag):
+        handler.send_response(304)
+        handler.send_header("ETag", etag)
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+        return
+
+    if encoding:
+        body = compress(body) if compress else gzip.compress(body, compresslevel=6, mtime=0)
+
+    handler.send_response(200)
+    handler.send_header("Content-Type", content_type)
+    handler.send_header("Content-Length", str(len(body)))
+    handler.send_header("ETag", etag)
+    handler.send_header("Cache-Control", "no-cache")
+    handler.send_header("Vary", "Accept-Encoding")
+    if encoding:
+        handler.send_header("Content-Encoding", encoding)
+    handler.end_headers()
+    if not head_only:
+        handler.wfile.write(body)
@@ -46,12 +46,13 @@ def sanitize_filename(filename: str) -> str:
     return sanitized
 
 
-def calculate_sha256(filepath: str) -> Optional[str]:
+def calculate_sha256(filepath: str, throttle=None) -> Optional[str]:
     """
     Calculates the SHA256 hash of a file.
 
     Args:
         filepath (str): The path to the file.
+        throttle (Optional[IOThrottle]): Rate limiter charged for the open and every read.
 
     Returns:
         Optional[str]: The SHA256 hash of the file, or None on error.
@@ -66,9 +67,13 @@ def calculate_sha256(filepath: str) -> Optional[str]:
 
     sha256_hash = hashlib.sha256()
     try:
+        if throttle is not None:
+            throttle.acquire_open()
         with open(filepath, "rb") as f:
             # Read in chunks for large files
-            for byte_block in iter(lambda: f.read(4096), b""):
+            for byte_block in iter(lambda: f.read(65536), b""):
+                if throttle is not None:
+                    throttle.acquire_bytes(len(byte_block))
                 sha256_hash.update(byte_block)
         return sha256_hash.hexdigest()
     except (IOError, OSError) as e:
@@ -106,4 +111,45 @@ def log_message(log_file: TextIO, message: str) -> None:
     except (IOError, OSError, UnicodeEncodeError) as e:
         error_msg = f"*** CRITICAL log_message ERROR: {e!r}\n"
         sys.stderr.write(error_msg)
-        print(error_msg, end="")
\ No newline at end of file
+        print(error_msg, end="")
+
+
+def format_size(num_bytes: int) -> str:
+    """
+    Formats a byte count for display, e.g. 10485760 -> "10 MB".
+
+    Args:
+        num_bytes (int): Size in bytes.
+
+    Returns:
+        str: Human-readable size.
+    """
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1024 or unit == "TB":
+            return f"{size:.0f} {unit}" if unit == "B" or size >= 100 else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def get_rss_mb() -> Optional[float]:
+    """
+    Returns the current resident memory of this process in MB.
+    Uses /proc on Linux and falls back to the peak RSS from the resource module.
+
+    Returns:
+        Optional[float]: Resident memory in MB, or None if it cannot be determined.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except (ImportError, OSError, ValueError):
+        return None
@@ -5,16 +5,15 @@ Author: Jesse Tudela
 
 import http.server
 import socketserver
-import subprocess
-import shutil
 import threading
 import time
 import os
 import json
 import codecs
+import gc
+import heapq
 import io
 import sys
-import signal
 from urllib.parse import urlparse
 from datetime import datetime
 
@@ -23,12 +22,18 @@ sys.stdout.reconfigure(line_buffering=True)
 sys.stderr.reconfigure(line_buffering=True)
 
 # Import from local modules
+# Settings are read as config.<NAME> at call time, since config loads explicitly (not on import).
+# Heavy optional dependencies (pypdf) are imported only when a job that needs them starts.
 try:
-    from config import EXCLUDED_FOLDERS, DUPLICATE_HOLDING_DIR, LOG_NAME_PREFIX, MOVE_DUPLICATES, PORT, EXCLUDED_FILES, PDF_TARGET_CHUNK_MB, PDF_PAGE_CHUNK_LIMIT
-    from utils import sanitize_filename, calculate_sha256, log_message
-    from pypdf import PdfReader, PdfWriter
+    import config
+    from utils import sanitize_filename, calculate_sha256, log_message, get_rss_mb, format_size
+    from static_server import StaticCache, send_entry, send_rendered
+    from weeding_plan import PlanWriter, apply_plan, undo_plan, read_journal, ACTIONS
+    from io_throttle import IO_THROTTLE, open_throttled
+    from scan_scheduler import DeviceScheduler, collect_files
+    from path_index import PathIndex
 except ImportError:
-    print("Error: 'config.py', 'utils.py', or 'pypdf' not found. Please make sure they are in the same directory and pypdf is installed.")
+    print("Error: one of the Data Librarian core modules (config, utils, static_server, weeding_plan, io_throttle, scan_scheduler, path_index) was not found. Please make sure they are in the same directory.")
     sys.exit(1)
 
 
@@ -40,6 +45,7 @@ keep_running = True
 total_files = 0
 files_checked = 0
 log_file_path = ""
+plan_file_path = ""
 # Use os.path.abspath to get a clean, absolute path
 root_directory = os.path.abspath(".") 
 
@@ -49,13 +55,79 @@ pdf_keep_running = True
 pdf_output_buffer = []
 # ------------------------------
 
+# Output buffers exist for the web UI to poll; headless runs (batch_cli) turn them off
+# so long jobs do not keep every log line in memory
+keep_output_buffers = True
+
+# In-memory cache for index.html and static assets (invalidated by file mtime)
+static_cache = StaticCache()
+
+# Persistent path search index, opened on first use (see get_path_index)
+path_index = None
+path_index_lock = threading.Lock()
+
+
+def get_path_index():
+    """
+    Returns the shared PathIndex for root_directory, opening it on first use.
+    """
+    global path_index
+    with path_index_lock:
+        if path_index is None:
+            config.ensure_loaded()
+            path_index = PathIndex(config.INDEX_PATH, root_directory)
+        return path_index
+
+
+def refresh_index_from_plan(plan_path, log):
+    """
+    Updates the search index for every source path a plan's journal touched,
+    so moves show up in search and folder sizes without a rescan.
+    """
+    try:
+        journal_state = read_journal(plan_path)
+        index = get_path_index()
+        # A duplicate replaced by a link no longer costs space; one restored by undo does again
+        linked, restored, others = [], [], []
+        for record in journal_state.values():
+            if record.get("status") == "done" and record.get("action") != "move":
+                linked.append(record["src"])
+            elif record.get("status") == "undone":
+                restored.append(record["src"])
+            else:
+                others.append(record["src"])
+        index.refresh_paths(linked, duplicate=False)
+        index.refresh_paths(restored, duplicate=True)
+        index.refresh_paths(others)
+    except Exception as e:
+        log_message(log, f"*** WARNING: Could not update search index: {e!r}\n")
+
+
+def apply_io_limits():
+    """
+    Pushes the configured I/O limits to the shared throttle. Running jobs pick them up immediately.
+    A limit that is not a number (hand-edited config.json) is treated as unlimited.
+    """
+    limits = []
+    for key in ("IO_BYTES_PER_SEC", "IO_OPENS_PER_SEC"):
+        value = getattr(config, key)
+        if check_config_value(key, value):
+            print(f"*** WARNING: Ignoring invalid {key} {value!r} in {config.CONFIG_FILE}; using 0 (unlimited).")
+            value = 0
+        limits.append(value)
+    IO_THROTTLE.set_limits(*limits)
+
 
 def run_script(target_folder=None):
     """
     Runs the duplicate file cleaning script as a separate process
     and captures its output.
+
+    Returns:
+        Optional[dict]: Summary of the run (counts, plan and log paths), or None if it failed.
     """
     global script_running, output_buffer, files_checked, total_files, script_process, keep_running, log_file_path, root_directory
+    global plan_file_path
 
     # --- Reset state for a new run ---
     script_running = True
@@ -65,26 +137,35 @@ def run_script(target_folder=None):
     keep_running = True
     
     log = None
+    summary = None
 
     try:
+        # Inside the try so a bad setting is reported and script_running is still reset
+        config.ensure_loaded()
+        apply_io_limits()
         start_time = datetime.now()
         # Format timestamp for filenames (no colons or other invalid chars)
         timestamp = start_time.strftime("%m-%d-%Y_%H-%M-%S")
-        log_file_name = f"{os.path.splitext(LOG_NAME_PREFIX)[0]}_{timestamp}.txt"
+        log_file_name = f"{os.path.splitext(config.LOG_NAME_PREFIX)[0]}_{timestamp}.txt"
         
         # Create holding dir if it doesn't exist, as it's needed for the log
-        if not os.path.exists(DUPLICATE_HOLDING_DIR):
+        if not os.path.exists(config.DUPLICATE_HOLDING_DIR):
             try:
-                os.makedirs(DUPLICATE_HOLDING_DIR)
+                os.makedirs(config.DUPLICATE_HOLDING_DIR)
             except OSError as e:
-                output_buffer.append(f"*** CRITICAL ERROR: Could not create holding directory '{DUPLICATE_HOLDING_DIR}': {e!r}\n")
+                if keep_output_buffers:
+                    output_buffer.append(f"*** CRITICAL ERROR: Could not create holding directory '{config.DUPLICATE_HOLDING_DIR}': {e!r}\n")
                 return
 
-        log_path = os.path.join(DUPLICATE_HOLDING_DIR, log_file_name)
+        log_path = os.path.join(config.DUPLICATE_HOLDING_DIR, log_file_name)
         log_file_path = os.path.abspath(log_path) # Update global for web UI
 
         file_hashes = {}
         files_moved = 0
+        apply_errors = 0
+        apply_changed = 0
+        file_errors = 0 # Files that could not be read or processed
+        plan = None
 
         try:
             log = codecs.open(log_path, "w", encoding="utf-8")
@@ -92,83 +173,115 @@ def run_script(target_folder=None):
             log_message(log, f"DUPLICATE FILE DETECTION STARTED AT: [{start_time.isoformat()}]\n")
             log_message(log, "----------------------------------------------------------------------------------------------------\n\n")
 
-            # --- First Pass: Count files (for progress bar) ---
+            # --- First Pass: Collect files grouped by device (also gives the progress bar total) ---
             log_message(log, "Calculating total files...\n")
-            temp_total = 0
-            
+
             scan_dir = target_folder if target_folder else root_directory
-            
-            for root, dirs, files in os.walk(scan_dir):
-                # Ensure we respect excluded folders during count
-                dirs[:] = [d for d in dirs if d not in EXCLUDED_FOLDERS]
-                
-                # Exclude script/config files
-                current_files = [f for f in files if f not in EXCLUDED_FILES]
-                temp_total += len(current_files)
-            
-            total_files = temp_total # Assign to global
+
+            file_groups, total_files = collect_files(scan_dir, config.EXCLUDED_FOLDERS, config.EXCLUDED_FILES,
+                                                     keep_running=lambda: keep_running)
             log_message(log, f"Scanning directory: {scan_dir}\n")
             log_message(log, f"Total files to scan: {total_files}\n")
-            
-            # --- Second Pass: Process files ---
-            files_processed = 0 # Use a local counter for the final tally
-            for root, dirs, files in os.walk(scan_dir):
-                if not keep_running:
-                    log_message(log, "\n*** USER CANCELLATION DETECTED ***\n")
-                    break
-                    
-                dirs[:] = [d for d in dirs if d not in EXCLUDED_FOLDERS]
 
-                for filename in files:
-                    if not keep_running:
-                        break
+            scheduler = DeviceScheduler(config.DEVICE_WORKERS, config.DEVICE_TYPE_OVERRIDES)
+            scheduler.prepare(file_groups, log)
 
-                    # Exclude self and helper files
-                    if filename in EXCLUDED_FILES:
-                        continue
+            # Every scanned file is recorded in the search index during detection
+            try:
+                index = get_path_index()
+                index_scan_id = index.begin_scan()
+            except Exception as e:
+                index = None
+                log_message(log, f"*** WARNING: Search index unavailable: {e!r}\n")
 
-                    filepath = os.path.join(root, filename)
-                    files_checked += 1 # Update global counter for UI
-                    files_processed += 1 # Update local counter for final log
-                    
+            # Detection only records duplicates in a plan file; see weeding_plan.apply_plan
+            plan_path = os.path.join(config.DUPLICATE_HOLDING_DIR, f"{os.path.splitext(config.LOG_NAME_PREFIX)[0]}_{timestamp}.plan.jsonl")
+            plan = PlanWriter(plan_path, config.DUPLICATE_HOLDING_DIR, scan_dir)
+            plan_file_path = os.path.abspath(plan_path) # Update global for web UI
+
+            # --- Second Pass: Hash files, each device with its own worker pool ---
+            # Hashes arrive in completion order, which varies between runs; keep them by walk position.
+            # Paths already live in file_groups, so only the hashes are stored here (False: not hashed,
+            # e.g. after a cancel). Together with file_groups this holds every path and hash in memory
+            # until detection, roughly 200-300 bytes per file.
+            files_processed = 0 # Use a local counter for the final tally
+            hashes_by_seq = [False] * total_files
+            for _path, file_hash, seq in scheduler.run(file_groups, lambda path: calculate_sha256(path, IO_THROTTLE),
+                                                       keep_running=lambda: keep_running):
+                files_checked += 1 # Update global counter for UI
+                files_processed += 1 # Update local counter for final log
+                hashes_by_seq[seq] = file_hash
+
+            # --- Detection in walk order: the first copy in the walk is kept as the original ---
+            # Same tree, same plan, no matter which worker finished first
+            for files in file_groups.values():
+                files.sort(key=lambda item: item[2]) # Undo the inode order used for reading
+            for filepath, _inode, seq in heapq.merge(*file_groups.values(), key=lambda item: item[2]):
+                file_hash = hashes_by_seq[seq]
+                if file_hash is False:
+                    continue
+                if index is not None:
                     try:
-                        file_hash = calculate_sha256(filepath)
-                        if file_hash is None:
-                            # Error already logged by calculate_sha256
-                            continue
-
-                        if file_hash in file_hashes:
-                            original_filepath = file_hashes[file_hash]
-                            original_filename = os.path.basename(original_filepath)
-                            duplicate_filename = os.path.basename(filepath)
-                            sanitized_filename = sanitize_filename(duplicate_filename) # Use the imported config variable
-                            sanitized_dest_path = os.path.join(DUPLICATE_HOLDING_DIR, sanitized_filename)
-
-                            log_message(
-                                log,
-                                f"Duplicate found:\n  Original: [{original_filename!r}]\n  Duplicate: [{duplicate_filename!r}]\n  Moved as: [{sanitized_filename!r}]\n\n",
-                            )
-                            
-                            if MOVE_DUPLICATES:
-                                # log_message(log, f"Attempting to move: {duplicate_filename!r} to {sanitized_dest_path!r}\n")
-                                try:
-                                    if os.path.exists(filepath): # Check if file still exists
-                                        shutil.move(filepath, sanitized_dest_path)
-                                        files_moved += 1
-                                        # log_message(log, f"Successfully moved: {duplicate_filename!r} to {sanitized_dest_path!r}\n")
-                                    else:
-                                        log_message(log, f"*** WARNING: File vanished before move: {filepath!r}\n\n")
-                                except (OSError, IOError) as e:
-                                    log_message(
-                                        log,
-                                        f"*** ERROR moving file: {duplicate_filename!r} to {sanitized_dest_path!r} - {e!r}\n\n{e!r}\n",
-                                    )
-                        else:
-                            file_hashes[file_hash] = filepath
-                            
+                        # Every copy after the first counts toward its folders' reclaimable bytes
+                        index.add(filepath, duplicate=file_hash is not None and file_hash in file_hashes)
+                    except OSError:
+                        pass # Vanished since hashing; the next scan prunes it
                     except Exception as e:
-                        # Catch potential errors like FileNotFoundError if a file is deleted during scan
-                        log_message(log, f"*** ERROR processing file [{filepath!r}]: {e!r}\n\n")
+                        log_message(log, f"*** WARNING: Search index update failed, disabling for this scan: {e!r}\n")
+                        index = None
+
+                try:
+                    if file_hash is None:
+                        # Not a regular file (dangling symlink, FIFO, vanished): skipped quietly, as before.
+                        # A regular file that could not be read is an error, already logged by calculate_sha256.
+                        if os.path.isfile(filepath):
+                            file_errors += 1
+                        continue
+
+                    if file_hash in file_hashes:
+                        original_filepath = file_hashes[file_hash]
+                        original_filename = os.path.basename(original_filepath)
+                        duplicate_filename = os.path.basename(filepath)
+                        sanitized_filename = sanitize_filename(duplicate_filename) # Use the imported config variable
+                        # Reserve a unique holding-bin name; moves happen later when the plan is applied
+                        planned_dest_path = plan.add(filepath, original_filepath, file_hash, sanitized_filename)
+
+                        log_message(
+                            log,
+                            f"Duplicate found:\n  Original: [{original_filename!r}]\n  Duplicate: [{duplicate_filename!r}]\n  Moved as: [{os.path.basename(planned_dest_path)!r}]\n\n",
+                        )
+                    else:
+                        file_hashes[file_hash] = filepath
+                        
+                except Exception as e:
+                    # Catch potential errors like FileNotFoundError if a file is deleted during scan
+                    file_errors += 1
+                    log_message(log, f"*** ERROR processing file [{filepath!r}]: {e!r}\n\n")
+
+            if not keep_running:
+                log_message(log, "\n*** USER CANCELLATION DETECTED ***\n")
+
+            if index is not None:
+                try:
+                    index.flush()
+                    # Only a complete scan has seen every file, so only then drop the ones it missed
+                    removed = index.prune(scan_dir, index_scan_id) if keep_running else 0
+                    log_message(log, f"Search index updated: {index.count()} entries ({removed} stale removed)\n")
+                except Exception as e:
+                    log_message(log, f"*** WARNING: Could not finalize search index: {e!r}\n")
+
+            plan.close()
+            log_message(log, f"\nPlan written: {plan_file_path} ({plan.count} duplicate(s), {plan.total_bytes / (1024 * 1024):.2f}MB)\n")
+
+            if config.MOVE_DUPLICATES and plan.count and keep_running:
+                stats = apply_plan(plan_file_path, log, config.DUPLICATE_ACTION, config.MOVE_WORKERS,
+                                   keep_running=lambda: keep_running)
+                files_moved = stats["done"]
+                apply_errors = stats["errors"]
+                apply_changed = stats["changed"]
+                refresh_index_from_plan(plan_file_path, log)
+            elif plan.count:
+                log_message(log, "Dry run: no files were moved. Apply the plan to move them.\n")
 
             end_time = datetime.now()
             duration = end_time - start_time
@@ -180,18 +293,37 @@ def run_script(target_folder=None):
                 f"Total Files Processed: [{files_processed}]\n"
                 f"Total Files Moved: [{files_moved}]\n",
             )
+            summary = {
+                "scan_dir": os.path.abspath(scan_dir),
+                "total_files": total_files,
+                "files_processed": files_processed,
+                "errors": file_errors,
+                "duplicates": plan.count,
+                "duplicate_bytes": plan.total_bytes,
+                "files_moved": files_moved,
+                "apply_errors": apply_errors,
+                "apply_changed": apply_changed,
+                "cancelled": not keep_running,
+                "plan_file": plan_file_path,
+                "log_file": log_file_path,
+                "duration_seconds": duration.total_seconds(),
+            }
 
         except (OSError, IOError) as e:
             error_msg = f"*** CRITICAL ERROR: Failed to open or write to log file: {log_path!r} - {e!r}\n"
             sys.stderr.write(error_msg)
-            output_buffer.append(error_msg) # Try to send to UI
+            if keep_output_buffers:
+                output_buffer.append(error_msg) # Try to send to UI
         except Exception as e:
             error_msg = f"*** UNEXPECTED ERROR in run_script: {e!r}\n"
             sys.stderr.write(error_msg)
-            output_buffer.append(error_msg)
+            if keep_output_buffers:
+                output_buffer.append(error_msg)
             if log:
                 log_message(log, error_msg)
         finally:
+            if plan:
+                plan.close()
             if log:
                 log.close()
 
@@ -199,83 +331,363 @@ def run_script(target_folder=None):
          # Top level catch for initialization errors
          error_msg = f"*** CRITICAL INIT ERROR: {e!r}\n"
          sys.stderr.write(error_msg)
-         output_buffer.append(error_msg)
+         if keep_output_buffers:
+             output_buffer.append(error_msg)
     
     finally:
         script_running = False
         script_process = None # Clear process object
 
-def split_pdf_adaptive(file_path, target_max_mb, initial_page_chunk, log):
+    return summary
+
+def run_plan_script(plan_path, undo=False, action=None, workers=None):
+    """
+    Applies (or undoes) a duplicate plan written by run_script, logging like run_script does.
+    Re-running an interrupted apply resumes from its journal.
+    """
+    global script_running, output_buffer, keep_running, log_file_path
+
+    script_running = True
+    output_buffer = []
+    keep_running = True
+    log = None
+
+    try:
+        config.ensure_loaded()
+        start_time = datetime.now()
+        timestamp = start_time.strftime("%m-%d-%Y_%H-%M-%S")
+        step_name = "undo" if undo else "apply"
+        log_path = os.path.join(os.path.dirname(plan_path), f"{os.path.splitext(config.LOG_NAME_PREFIX)[0]}_{step_name}_{timestamp}.txt")
+        log_file_path = os.path.abspath(log_path) # Update global for web UI
+
+        log = codecs.open(log_path, "w", encoding="utf-8")
+        log_message(log, f"DUPLICATE PLAN {step_name.upper()} STARTED AT: [{start_time.isoformat()}]\n")
+        log_message(log, f"Plan: {plan_path}\n")
+
+        if undo:
+            undo_plan(plan_path, log)
+        else:
+            apply_plan(plan_path, log, action or config.DUPLICATE_ACTION, workers or config.MOVE_WORKERS,
+                       keep_running=lambda: keep_running)
+        refresh_index_from_plan(plan_path, log)
+
+        log_message(log, f"DUPLICATE PLAN {step_name.upper()} FINISHED AT: [{datetime.now().isoformat()}]\n")
+    except Exception as e:
+        error_msg = f"*** UNEXPECTED ERROR in run_plan_script: {e!r}\n"
+        sys.stderr.write(error_msg)
+        if keep_output_buffers:
+            output_buffer.append(error_msg)
+        if log:
+            log_message(log, error_msg)
+    finally:
+        if log:
+            log.close()
+        script_running = False
+
+
+def split_pdf_adaptive(file_path, target_max_mb, initial_page_chunk, log, memory_budget_mb=0,
+                       deduplicate=False, recompress=False):
     """
     Splits a PDF into chunks. If a chunk exceeds target_max_mb, it retries with smaller page counts.
+
+    The source is read lazily from an open file handle (never loaded whole into memory).
+    Objects resolved from it are kept while a chunk is retried, so shared resources are not
+    re-parsed on every attempt, and released once the chunk is written.
+    If memory_budget_mb > 0, chunk page counts are also capped so the memory the split adds stays within it.
+
+    Packing mode (deduplicate=True) merges identical objects within each chunk and moves
+    chunk boundaries so pages sharing fonts/images stay together; recompress=True also
+    re-deflates page content streams. Either reduces per-chunk size, so fewer chunks are needed.
+
+    Returns:
+        bool: True if the whole file was split, False if it failed or was cancelled.
     """
+    from pypdf import PdfReader, PdfWriter
+
+    # Memory already in use (server, earlier files) does not count against the budget
+    baseline_rss_mb = get_rss_mb()
+
     try:
-        reader = PdfReader(file_path)
-        total_pages = len(reader.pages)
-        base_name = os.path.splitext(file_path)[0]
-        
-        current_page_chunk = initial_page_chunk
-        start_page = 0
-        
-        while start_page < total_pages:
-            if not pdf_keep_running:
-                 return
+        # Reads go through the shared I/O throttle so splitting respects the configured disk share
+        with open_throttled(file_path, IO_THROTTLE) as source:
+            reader = PdfReader(source)
+            total_pages = len(reader.pages)
+            base_name = os.path.splitext(file_path)[0]
 
-            # Try to create a chunk
-            temp_files_created = []
-            success = False
-            
-            while not success:
+            current_page_chunk = initial_page_chunk
+            start_page = 0
+
+            # Packing statistics for the final log line
+            page_resources = {}
+            chunks_written = 0
+            output_bytes = 0
+            unpacked_bytes = 0
+            objects_merged = 0
+
+            if deduplicate and not hasattr(PdfWriter, "compress_identical_objects"):
+                log_message(log, "   > Installed pypdf cannot merge identical objects; upgrade pypdf for deduplication.\n")
+                deduplicate = False
+
+            # Pages per chunk allowed by the memory budget (None: no budget). Kept apart from
+            # current_page_chunk so it can grow back once memory is available again.
+            memory_cap = None
+            if memory_budget_mb > 0:
+                # Rough per-page cost from the source size; keep a chunk well under half the budget
+                avg_page_mb = (os.path.getsize(file_path) / (1024 * 1024)) / max(total_pages, 1)
+                budget_pages = max(1, int((memory_budget_mb / 2) / max(avg_page_mb, 0.001)))
+                memory_cap = budget_pages
+                if budget_pages < current_page_chunk:
+                    log_message(log, f"   > Memory budget {memory_budget_mb}MB: starting at {budget_pages} pages per chunk.\n")
+
+            while start_page < total_pages:
                 if not pdf_keep_running:
-                     return
+                     return False
 
-                end_page = min(start_page + current_page_chunk, total_pages)
-                writer = PdfWriter()
-                
-                for i in range(start_page, end_page):
-                    writer.add_page(reader.pages[i])
-                
-                part_num = (start_page // initial_page_chunk) + 1 
-                # Use _pages_ as requested by user for clarity and collision avoidance
-                output_filename = f"{base_name}_pages_{start_page + 1}-{end_page}.pdf"
-                
-                try:
-                    with open(output_filename, "wb") as out_file:
-                        writer.write(out_file)
-                    temp_files_created.append(output_filename)
-                    
-                    # Check size
-                    file_size_mb = os.path.getsize(output_filename) / (1024 * 1024)
-                    
-                    if file_size_mb > target_max_mb:
-                        log_message(log, f"   > Chunk {output_filename} is {file_size_mb:.2f}MB (Max: {target_max_mb}MB). Too big.\n")
-                        # Delete the file
-                        os.remove(output_filename)
-                        temp_files_created.remove(output_filename)
-                        
-                        # Calculate new safer chunk size
-                        ratio = target_max_mb / file_size_mb
-                        current_page_chunk = int(current_page_chunk * ratio * 0.9) # 90% compliance factor
-                        if current_page_chunk < 1:
-                            current_page_chunk = 1 # Minimum 1 page
-                        
-                        log_message(log, f"   > Retrying with {current_page_chunk} pages...\n")
-                    else:
-                        success = True
-                        log_message(log, f"   > Created: {os.path.basename(output_filename)} ({file_size_mb:.2f}MB)\n")
-                        start_page = end_page
-                        # Reset chunk size to initial for next batch? Or keep adaptive? 
-                        # Let's keep adaptive for this file as pages are likely similar density
-                        
-                except Exception as e:
-                    log_message(log, f"*** ERROR writing chunk: {e}\n")
-                    return
+                success = False
+
+                while not success:
+                    if not pdf_keep_running:
+                         return False
+
+                    page_chunk = current_page_chunk
+                    if memory_cap is not None:
+                        memory_cap = enforce_memory_budget(reader, memory_cap, budget_pages, memory_budget_mb,
+                                                           baseline_rss_mb, log)
+                        page_chunk = min(page_chunk, memory_cap)
+
+                    end_page = min(start_page + page_chunk, total_pages)
+                    if deduplicate:
+                        end_page = choose_chunk_end(reader, start_page, end_page, total_pages, page_resources)
+                    writer = PdfWriter()
+
+                    for i in range(start_page, end_page):
+                        writer.add_page(reader.pages[i])
+
+                    chunk_merged = 0
+                    if recompress:
+                        for page in writer.pages:
+                            page.compress_content_streams()
+                    if deduplicate:
+                        objects_before = count_writer_objects(writer)
+                        writer.compress_identical_objects()
+                        chunk_merged = objects_before - count_writer_objects(writer)
+
+                    # Use _pages_ as requested by user for clarity and collision avoidance
+                    output_filename = f"{base_name}_pages_{start_page + 1}-{end_page}.pdf"
+
+                    try:
+                        with open(output_filename, "wb") as out_file:
+                            writer.write(out_file)
+                        # Drop the cloned pages before the next attempt; reader-side objects stay cached for retries
+                        del writer
+
+                        # Check size
+                        file_size_mb = os.path.getsize(output_filename) / (1024 * 1024)
+
+                        if file_size_mb > target_max_mb:
+                            log_message(log, f"   > Chunk {output_filename} is {file_size_mb:.2f}MB (Max: {target_max_mb}MB). Too big.\n")
+                            # Delete the file
+                            os.remove(output_filename)
+
+                            # Calculate new safer chunk size
+                            ratio = target_max_mb / file_size_mb
+                            # Scale the pages actually written; packing may have ended the chunk early
+                            current_page_chunk = int((end_page - start_page) * ratio * 0.9) # 90% compliance factor
+                            if current_page_chunk < 1:
+                                current_page_chunk = 1 # Minimum 1 page
+
+                            log_message(log, f"   > Retrying with {current_page_chunk} pages...\n")
+                        else:
+                            success = True
+                            chunks_written += 1
+                            output_bytes += os.path.getsize(output_filename)
+                            if deduplicate or recompress:
+                                # Only accepted chunks are measured; rejected attempts are not serialized twice
+                                unpacked_bytes += measure_unpacked_size(reader, start_page, end_page)
+                            objects_merged += chunk_merged
+                            # Chunk is on disk: release everything resolved for it, so the reader's
+                            # cache never holds more than one chunk's objects
+                            release_reader_objects(reader)
+                            memory_note = ""
+                            if memory_budget_mb > 0:
+                                rss_mb = get_rss_mb()
+                                if rss_mb is not None and baseline_rss_mb is not None:
+                                    memory_note = f" [+{rss_mb - baseline_rss_mb:.0f}MB / budget {memory_budget_mb}MB]"
+                            log_message(log, f"   > Created: {os.path.basename(output_filename)} ({file_size_mb:.2f}MB){memory_note}\n")
+                            start_page = end_page
+                            # Keep the adaptive chunk size for this file as pages are likely similar density
+
+                    except Exception as e:
+                        log_message(log, f"*** ERROR writing chunk: {e}\n")
+                        return False
+
+            if deduplicate or recompress:
+                saved_mb = (unpacked_bytes - output_bytes) / (1024 * 1024)
+                saved_pct = 100.0 * (unpacked_bytes - output_bytes) / unpacked_bytes if unpacked_bytes else 0.0
+                log_message(
+                    log,
+                    f"   > Packing: {chunks_written} chunk(s), {output_bytes / (1024 * 1024):.2f}MB written, "
+                    f"{saved_mb:.2f}MB ({saved_pct:.1f}%) smaller than the same chunks unpacked, "
+                    f"{objects_merged} identical object(s) merged.\n",
+                )
 
     except Exception as e:
         log_message(log, f"*** ERROR processing PDF {file_path}: {e}\n")
+        return False
+    return True
+
+
+class ByteCounter:
+    """
+    Write-only sink that counts bytes, for sizing a PdfWriter's output without keeping it.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def write(self, data):
+        self.count += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.count
+
+    def flush(self):
+        pass
+
+
+def measure_unpacked_size(reader, start_page, end_page):
+    """
+    Returns the size a page range would have if written by plain splitting, without packing.
+    Serializes into a ByteCounter, so nothing is kept in memory or written to disk.
+    """
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for i in range(start_page, end_page):
+        writer.add_page(reader.pages[i])
+    counter = ByteCounter()
+    writer.write(counter)
+    return counter.tell()
 
 
-def run_pdf_script(target_folder, max_mb, initial_pages):
+def count_writer_objects(writer):
+    """
+    Returns the number of live (non-removed) objects held by a PdfWriter.
+    """
+    return sum(1 for obj in getattr(writer, "_objects", []) if obj is not None)
+
+
+# Resource categories whose objects are typically shared between pages
+SHARED_RESOURCE_KEYS = ("/Font", "/XObject", "/ExtGState", "/ColorSpace", "/Pattern", "/Shading")
+
+
+def get_page_resource_ids(reader, page_index, cache):
+    """
+    Returns the object numbers of the shared resources (fonts, images, ...) a page uses.
+    Results are cached per page index; they are small sets of ints.
+    """
+    if page_index in cache:
+        return cache[page_index]
+
+    ids = set()
+    try:
+        resources_ref = reader.pages[page_index].get("/Resources")
+        if resources_ref is not None:
+            if hasattr(resources_ref, "idnum"):
+                ids.add(resources_ref.idnum)
+            resources = resources_ref.get_object()
+            for key in SHARED_RESOURCE_KEYS:
+                category = resources.get(key)
+                if category is None:
+                    continue
+                if hasattr(category, "idnum"):
+                    ids.add(category.idnum)
+                category = category.get_object()
+                if hasattr(category, "values"):
+                    for value in category.values():
+                        if hasattr(value, "idnum"):
+                            ids.add(value.idnum)
+    except Exception:
+        # Malformed resources just mean no boundary preference for this page
+        pass
+
+    cache[page_index] = frozenset(ids)
+    return cache[page_index]
+
+
+def choose_chunk_end(reader, start_page, end_page, total_pages, cache):
+    """
+    Moves a chunk's end back (by at most a quarter of the chunk) to the boundary where the
+    fewest shared resources are split across two chunks, so they are not copied into both.
+
+    Returns:
+        int: The (exclusive) end page to use.
+    """
+    if end_page >= total_pages or end_page - start_page < 2:
+        return end_page
+
+    lowest = start_page + max(1, int((end_page - start_page) * 0.75))
+    best_end = end_page
+    best_shared = None
+    for candidate in range(end_page, lowest - 1, -1):
+        shared = len(get_page_resource_ids(reader, candidate - 1, cache) & get_page_resource_ids(reader, candidate, cache))
+        if best_shared is None or shared < best_shared:
+            best_end, best_shared = candidate, shared
+        if shared == 0:
+            break
+    return best_end
+
+
+def release_reader_objects(reader):
+    """
+    Drops the objects a PdfReader has parsed and cached so far.
+    Page tree entries are kept; their content is re-read from the file on demand.
+    """
+    resolved = getattr(reader, "resolved_objects", None)
+    if resolved is not None:
+        resolved.clear()
+    gc.collect()
+
+
+def enforce_memory_budget(reader, memory_cap, max_cap, memory_budget_mb, baseline_rss_mb, log):
+    """
+    Keeps the memory a split adds (RSS growth since it started) under memory_budget_mb
+    before building the next chunk. Measuring growth rather than absolute RSS keeps the
+    server's own footprint, and memory CPython never hands back, from counting against it.
+    Over budget: releases the reader's cached objects, then halves the page cap if still over.
+    Well under budget: doubles the cap again, up to max_cap.
+
+    Returns:
+        int: The page cap to use for the next chunk.
+    """
+    rss_mb = get_rss_mb()
+    if rss_mb is None or baseline_rss_mb is None:
+        return memory_cap
+
+    growth_mb = rss_mb - baseline_rss_mb
+    if growth_mb > memory_budget_mb:
+        release_reader_objects(reader)
+        rss_mb = get_rss_mb()
+        growth_mb = rss_mb - baseline_rss_mb if rss_mb is not None else 0
+        if growth_mb > memory_budget_mb and memory_cap > 1:
+            memory_cap = max(1, memory_cap // 2)
+            log_message(log, f"   > Split is using {growth_mb:.0f}MB, over budget {memory_budget_mb}MB. "
+                             f"Reducing to {memory_cap} pages per chunk.\n")
+    elif growth_mb <= memory_budget_mb / 2 and memory_cap < max_cap:
+        memory_cap = min(max_cap, memory_cap * 2)
+        log_message(log, f"   > Split is using {growth_mb:.0f}MB of {memory_budget_mb}MB. "
+                         f"Allowing {memory_cap} pages per chunk.\n")
+    return memory_cap
+
+
+def run_pdf_script(target_folder, max_mb, initial_pages, memory_budget_mb=0, deduplicate=False, recompress=False):
+    """
+    Splits every PDF over max_mb under target_folder, logging to the PDF output buffer.
+
+    Returns:
+        Optional[dict]: Summary (pdfs_found, pdfs_split, errors, cancelled), or None if the job could not run.
+    """
     global pdf_script_running, pdf_output_buffer, pdf_keep_running
     
     pdf_script_running = True
@@ -289,21 +701,38 @@ def run_pdf_script(target_folder, max_mb, initial_pages):
     
     # We will just append to pdf_output_buffer directly for simplicity in this thread
     def log_to_buffer(msg):
-        pdf_output_buffer.append(msg)
+        if keep_output_buffers:
+            pdf_output_buffer.append(msg)
         print(msg, end="")
 
     try:
+        # Inside the try so a bad setting is reported and pdf_script_running is still reset
+        config.ensure_loaded()
+        apply_io_limits()
         log_to_buffer(f"PDF SPLITTER STARTED AT: [{start_time.isoformat()}]\n")
         log_to_buffer(f"Target Folder: {target_folder}\n")
         log_to_buffer(f"Max File Size: {max_mb} MB\n")
         log_to_buffer(f"Initial Page Split: {initial_pages}\n")
+        if memory_budget_mb > 0:
+            log_to_buffer(f"Memory Budget: {memory_budget_mb} MB\n")
+        if deduplicate or recompress:
+            log_to_buffer(f"Packing: deduplicate={deduplicate}, recompress={recompress}\n")
         log_to_buffer("-" * 60 + "\n")
 
         if not os.path.exists(target_folder):
             log_to_buffer(f"*** ERROR: Folder not found: {target_folder}\n")
-            return
+            return None
+
+        # Deferred import: pypdf is only needed once a segmenting job actually starts
+        try:
+            import pypdf  # noqa: F401
+        except ImportError:
+            log_to_buffer("*** ERROR: 'pypdf' is not installed. Install it with: pip install pypdf\n")
+            return None
 
         pdf_files_found = 0
+        pdf_files_split = 0
+        pdf_errors = 0
         
         for root, dirs, files in os.walk(target_folder):
             if not pdf_keep_running:
@@ -335,10 +764,15 @@ def run_pdf_script(target_folder, max_mb, initial_pages):
                                 def flush(self):
                                     pass
                             
-                            split_pdf_adaptive(file_path, max_mb, initial_pages, LogWrapper())
+                            if split_pdf_adaptive(file_path, max_mb, initial_pages, LogWrapper(), memory_budget_mb,
+                                                  deduplicate, recompress):
+                                pdf_files_split += 1
+                            elif pdf_keep_running:
+                                pdf_errors += 1
                             log_to_buffer(f"Done with {file}\n\n")
                             
                     except OSError as e:
+                        pdf_errors += 1
                         log_to_buffer(f"*** ERROR accessing {file}: {e}\n")
 
         end_time = datetime.now()
@@ -346,17 +780,183 @@ def run_pdf_script(target_folder, max_mb, initial_pages):
         log_to_buffer("-" * 60 + "\n")
         log_to_buffer(f"FINISHED. Processed {pdf_files_found} large PDF(s).\n")
         log_to_buffer(f"Total Time: {duration}\n")
+        return {
+            "pdfs_found": pdf_files_found,
+            "pdfs_split": pdf_files_split,
+            "errors": pdf_errors,
+            "cancelled": not pdf_keep_running,
+        }
 
     except Exception as e:
         log_to_buffer(f"*** CRITICAL ERROR: {e}\n")
+        return None
     finally:
         pdf_script_running = False
 
+def resolve_plan_path(plan_path):
+    """
+    Resolves a plan file named by a request, refusing anything outside the holding bin.
+    Plans decide which files get moved or replaced, so only ones this tool wrote may be run.
+
+    Returns:
+        tuple: (resolved path or None, HTTP status, error message or None)
+    """
+    config.ensure_loaded()
+    holding_real = os.path.realpath(config.DUPLICATE_HOLDING_DIR)
+    resolved = os.path.realpath(plan_path)
+    if not resolved.startswith(holding_real + os.sep):
+        return None, 403, f"Plan file must be inside the holding bin: {plan_path!r}"
+    if not os.path.isfile(resolved):
+        return None, 404, f"Plan file not found: {plan_path!r}"
+    return resolved, 200, None
+
+
+def list_library(rel_path, sort_by=""):
+    """
+    Lists one directory under the library root as CatalogCards (see docs/backend_api_spec.md).
+    Folder cards carry recursive totals from the path index, so huge trees can be sorted
+    by size without walking them. Folders whose mtime changed are re-synced first.
+
+    Args:
+        rel_path (str): Directory relative to the root ('' for the root itself).
+        sort_by (str): 'size' for largest first, otherwise directories then names.
+
+    Returns:
+        tuple: (HTTP status, JSON payload)
+    """
+    parts = [part for part in rel_path.replace("\\", "/").split("/") if part not in ("", ".")]
+    if os.path.isabs(rel_path) or ".." in parts:
+        return 400, {'success': False, 'error': 'Path must be relative to the library root'}
+
+    # List via the plain path so index keys line up; check the resolved one so symlinks cannot escape
+    directory = os.path.join(os.path.abspath(root_directory), *parts)
+    root_real = os.path.realpath(root_directory)
+    resolved = os.path.realpath(directory)
+    if resolved != root_real and not resolved.startswith(root_real + os.sep):
+        return 403, {'success': False, 'error': 'Path is outside the library root'}
+    if not os.path.isdir(directory):
+        return 404, {'success': False, 'error': f'Directory not found: {rel_path!r}'}
+
+    config.ensure_loaded()
+    listing = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        # Dangling symlink: describe the link itself
+                        st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue # Vanished or unreadable; leave it out rather than fail the listing
+                listing.append((entry, is_dir, st))
+    except OSError as e:
+        return 500, {'success': False, 'error': f'Could not list directory: {e!r}'}
+
+    subdirs = [entry.path for entry, is_dir, _st in listing
+               if is_dir and entry.name not in config.EXCLUDED_FOLDERS]
+    rollups = {}
+    try:
+        index = get_path_index()
+        # Cheap when nothing changed: one stat per folder, a listing only where its mtime moved
+        for path in [directory] + subdirs:
+            index.sync_directory(path, config.EXCLUDED_FILES, config.EXCLUDED_FOLDERS)
+        rollups = index.get_dir_stats(subdirs)
+    except Exception as e:
+        print(f"*** WARNING: Folder sizes unavailable: {e!r}")
+
+    cards = []
+    for entry, is_dir, st in listing:
+        card_path = "/".join(parts + [entry.name])
+        card = {
+            "name": entry.name,
+            "path": card_path,
+            "type": "directory" if is_dir else "file",
+            "created": datetime.fromtimestamp(st.st_ctime).isoformat(),
+            "modified": datetime.fromtimestamp(st.st_mtime).isoformat(),
+        }
+        if is_dir:
+            stats = rollups.get(card_path)
+            if stats is not None:
+                card.update({
+                    "size": format_size(stats["bytes"]),
+                    "bytes": stats["bytes"],
+                    "file_count": stats["files"],
+                    "duplicate_bytes": stats["dup_bytes"],
+                })
+        else:
+            card.update({"size": format_size(st.st_size), "bytes": st.st_size})
+        cards.append(card)
+
+    if sort_by == "size":
+        cards.sort(key=lambda card: card.get("bytes", -1), reverse=True)
+    else:
+        cards.sort(key=lambda card: (card["type"] != "directory", card["name"].lower()))
+    return 200, {'success': True, 'data': cards}
+
+
+# Settings that only take one of a fixed set of values
+CONFIG_CHOICES = {
+    "DUPLICATE_ACTION": ACTIONS,
+}
+
+
+def get_config_values():
+    """
+    Returns the full config.json content, with every backend setting (config.DEFAULTS)
+    filled in with the value currently in effect.
+    """
+    values = config.read_config_file()
+    values.update({key: getattr(config, key, default) for key, default in config.DEFAULTS.items()})
+    return values
+
+
+def check_config_value(key, value):
+    """
+    Checks a setting against the type of its default in config.DEFAULTS.
+
+    Returns:
+        Optional[str]: What is wrong with the value, or None if it is acceptable.
+    """
+    default = config.DEFAULTS[key]
+    if key in CONFIG_CHOICES:
+        return None if value in CONFIG_CHOICES[key] else f"expected one of {', '.join(CONFIG_CHOICES[key])}"
+    if isinstance(default, bool):
+        return None if isinstance(value, bool) else "expected true or false"
+    if isinstance(default, (int, float)):
+        # bool is an int subclass; a number setting must not silently accept true/false
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return "expected a number"
+        return None if value >= 0 else "must not be negative"
+    if isinstance(default, str):
+        return None if isinstance(value, str) else "expected a string"
+    if isinstance(default, list):
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            return "expected a list of strings"
+        return None
+    if isinstance(default, dict):
+        if not isinstance(value, dict):
+            return "expected an object"
+        numeric = default and all(isinstance(v, (int, float)) for v in default.values())
+        if numeric and not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value.values()):
+            return "expected numeric values"
+        return None
+    return None
+
+
 class MyHandler(http.server.SimpleHTTPRequestHandler):
     """
     Custom HTTP request handler for the web interface.
     """
 
+    def send_json(self, payload, status=200):
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.end_headers()
+        self.wfile.write(json.dumps(payload).encode('utf-8'))
+
     def do_GET(self):
         """
         Handles GET requests.
@@ -364,19 +964,7 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
         url_path = urlparse(self.path).path
 
         if url_path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html; charset=utf-8')
-            self.end_headers()
-            try:
-                with codecs.open('index.html', 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # Inject dynamic values
-                    content = content.replace("{rootfolder}", root_directory)
-                    content = content.replace("{log_file_path}", log_file_path)
-                    content = content.replace("{output}", "".join(output_buffer)) # Send current buffer on load
-                    self.wfile.write(content.encode('utf-8'))
-            except FileNotFoundError:
-                self.send_error(404, "File not found: index.html")
+            self.send_index()
             return
 
         elif url_path == '/get_output':
@@ -393,7 +981,8 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
             self.send_response(200)
             self.send_header('Content-type', 'application/json; charset=utf-8')
             self.end_headers()
-            self.wfile.write(json.dumps({'running': script_running, 'log_file_path': log_file_path}).encode('utf-8'))
+            self.wfile.write(json.dumps({'running': script_running, 'log_file_path': log_file_path, 'plan_file_path': plan_file_path,
+                                         'throttle': IO_THROTTLE.status()}).encode('utf-8'))
             return
 
         elif url_path == '/get_pdf_output':
@@ -409,7 +998,11 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
             self.send_response(200)
             self.send_header('Content-type', 'application/json; charset=utf-8')
             self.end_headers()
-            self.wfile.write(json.dumps({'running': pdf_script_running}).encode('utf-8'))
+            self.wfile.write(json.dumps({'running': pdf_script_running, 'throttle': IO_THROTTLE.status()}).encode('utf-8'))
+            return
+
+        elif url_path == '/api/config':
+            self.send_json({'success': True, 'data': get_config_values()})
             return
 
         elif url_path == '/cancel_script':
@@ -431,12 +1024,68 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
             return
             
         else:
-            # Handle 404 for favicon.ico and other unhandled requests quietly
-            if url_path.endswith('favicon.ico'):
+            # Serve static files (e.g. a built Next.js export) from the in-memory cache
+            entry = self.get_static_entry(url_path)
+            if entry is not None:
+                send_entry(self, entry, url_path)
+            elif url_path.endswith('favicon.ico'):
+                # Handle 404 for favicon.ico quietly
                 self.send_response(404)
                 self.end_headers()
             else:
-                super().do_GET()  # Serve other files if present (e.g., if you add CSS/JS files)
+                super().do_GET()  # Directory listings and 404s
+
+    def do_HEAD(self):
+        """
+        Handles HEAD requests for the page and cached assets with the same headers as GET.
+        """
+        url_path = urlparse(self.path).path
+
+        if url_path == '/':
+            self.send_index(head_only=True)
+            return
+
+        entry = self.get_static_entry(url_path)
+        if entry is not None:
+            send_entry(self, entry, url_path, head_only=True)
+        else:
+            super().do_HEAD()
+
+    def send_index(self, head_only=False):
+        """
+        Sends the rendered index.html. The template is parsed once per mtime; only the
+        dynamic values are filled per request, and the compressed body is reused while they are unchanged.
+        """
+        index_path = os.path.abspath('index.html')
+        body = static_cache.render(index_path, {
+            "rootfolder": root_directory,
+            "log_file_path": log_file_path,
+            "output": "".join(output_buffer), # Send current buffer on load
+        })
+        if body is None:
+            self.send_error(404, "File not found: index.html")
+            return
+        send_rendered(self, body, 'text/html; charset=utf-8', head_only,
+                      compress=lambda data: static_cache.render_gzip(index_path, data))
+
+    def get_static_entry(self, url_path):
+        """
+        Resolves a URL path to a cached static file, the way a static export expects:
+        `/dir/` -> `/dir/index.html`, `/page` -> `/page.html`.
+        """
+        fs_path = self.translate_path(url_path)
+        candidates = [fs_path]
+        if os.path.isdir(fs_path):
+            if not url_path.endswith('/'):
+                return None # Let SimpleHTTPRequestHandler issue the trailing-slash redirect
+            candidates = [os.path.join(fs_path, 'index.html')]
+        elif not os.path.splitext(fs_path)[1]:
+            candidates.append(fs_path + '.html')
+
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return static_cache.get(candidate)
+        return None
 
 
     def do_POST(self):
@@ -470,6 +1119,115 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
                self.end_headers()
                self.wfile.write(json.dumps({"status": "started"}).encode("utf-8"))
                
+        elif url_path == '/api/config':
+            content_length = int(self.headers.get('Content-Length', 0))
+            try:
+                updates = json.loads(self.rfile.read(content_length).decode("utf-8")) if content_length else {}
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                updates = None
+            if not isinstance(updates, dict):
+                self.send_json({'success': False, 'error': 'Body must be a JSON object'}, 400)
+                return
+
+            # Backend settings are type-checked; other sections (e.g. the frontend's) are stored as given
+            invalid = [f"{key} ({reason})" for key, reason in
+                       ((key, check_config_value(key, value)) for key, value in updates.items()
+                        if key in config.DEFAULTS) if reason]
+            if invalid:
+                self.send_json({'success': False, 'error': f"Invalid value for: {', '.join(invalid)}"}, 400)
+                return
+
+            if not config.save_config(updates):
+                self.send_json({'success': False, 'error': 'Could not save config.json'}, 500)
+                return
+
+            # Throttle changes apply to jobs that are already running
+            apply_io_limits()
+            self.send_json({'success': True, 'data': get_config_values()})
+
+        elif url_path == '/api/library':
+            content_length = int(self.headers.get('Content-Length', 0))
+            try:
+                data = json.loads(self.rfile.read(content_length).decode("utf-8")) if content_length else {}
+                rel_path = str(data.get("path", "") or "")
+                sort_by = str(data.get("sort", "") or "")
+            except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+                self.send_json({'success': False, 'error': 'Expected {"path": str}'}, 400)
+                return
+
+            status, payload = list_library(rel_path, sort_by)
+            self.send_json(payload, status)
+
+        elif url_path == '/api/search':
+            content_length = int(self.headers.get('Content-Length', 0))
+            try:
+                data = json.loads(self.rfile.read(content_length).decode("utf-8")) if content_length else {}
+                query = str(data.get("query", ""))
+                page = int(data.get("page", 1))
+                page_size = int(data.get("page_size", 50))
+            except (json.JSONDecodeError, UnicodeDecodeError, AttributeError, TypeError, ValueError):
+                self.send_json({'success': False, 'error': 'Expected {"query": str, "page": int, "page_size": int}'}, 400)
+                return
+
+            try:
+                found = get_path_index().search(query, page, page_size)
+            except Exception as e:
+                self.send_json({'success': False, 'error': f'Search failed: {e!r}'}, 500)
+                return
+
+            # Shape results like the library listing (CatalogCard), plus raw byte size for sorting
+            found["results"] = [
+                {
+                    "name": item["name"],
+                    "path": item["path"],
+                    "type": "file",
+                    "size": format_size(item["size"]),
+                    "bytes": item["size"],
+                    "created": datetime.fromtimestamp(item["ctime"]).isoformat(),
+                    "modified": datetime.fromtimestamp(item["mtime"]).isoformat(),
+                }
+                for item in found["results"]
+            ]
+            self.send_json({'success': True, 'data': found})
+
+        elif url_path in ('/apply_plan', '/undo_plan'):
+            if script_running:
+                self.send_json({"status": "running"})
+                return
+
+            content_length = int(self.headers.get('Content-Length', 0))
+            data = {}
+            if content_length > 0:
+                try:
+                    data = json.loads(self.rfile.read(content_length).decode("utf-8"))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    data = None
+            if not isinstance(data, dict):
+                self.send_json({"status": "error", "error": "Body must be a JSON object"}, 400)
+                return
+
+            requested = data.get("plan_path") or plan_file_path
+            if not requested or not isinstance(requested, str):
+                self.send_json({"status": "error", "error": "No plan file given"}, 400)
+                return
+            plan_path, status, error = resolve_plan_path(requested)
+            if error:
+                self.send_json({"status": "error", "error": error}, status)
+                return
+
+            action = data.get("action") or None
+            if action is not None and action not in ACTIONS:
+                self.send_json({"status": "error", "error": f"Unknown action {action!r}; expected one of {', '.join(ACTIONS)}"}, 400)
+                return
+
+            try:
+                workers = int(data["workers"]) if data.get("workers") else None
+            except (TypeError, ValueError):
+                workers = None
+
+            threading.Thread(target=run_plan_script, args=(plan_path, url_path == '/undo_plan', action, workers)).start()
+            self.send_json({"status": "started", "plan_path": plan_path})
+
         elif url_path == '/run_pdf_splitter':
             if pdf_script_running:
                 self.send_response(200)
@@ -484,17 +1242,25 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
             
             target_folder = data.get('target_folder', root_directory)
             try:
-                max_mb = float(data.get('max_size_mb', PDF_TARGET_CHUNK_MB))
+                max_mb = float(data.get('max_size_mb', config.PDF_TARGET_CHUNK_MB))
             except:
-                max_mb = PDF_TARGET_CHUNK_MB
+                max_mb = config.PDF_TARGET_CHUNK_MB
                 
             try:
-                initial_pages = int(data.get('initial_page_count', PDF_PAGE_CHUNK_LIMIT))
+                initial_pages = int(data.get('initial_page_count', config.PDF_PAGE_CHUNK_LIMIT))
+            except:
+                initial_pages = config.PDF_PAGE_CHUNK_LIMIT
+
+            try:
+                memory_budget_mb = float(data.get('memory_budget_mb', config.PDF_MEMORY_BUDGET_MB))
             except:
-                initial_pages = PDF_PAGE_CHUNK_LIMIT
+                memory_budget_mb = config.PDF_MEMORY_BUDGET_MB
+
+            deduplicate = bool(data.get('deduplicate', config.PDF_DEDUPLICATE_RESOURCES))
+            recompress = bool(data.get('recompress', config.PDF_RECOMPRESS_STREAMS))
 
             # Start thread
-            thread = threading.Thread(target=run_pdf_script, args=(target_folder, max_mb, initial_pages))
+            thread = threading.Thread(target=run_pdf_script, args=(target_folder, max_mb, initial_pages, memory_budget_mb, deduplicate, recompress))
             thread.daemon = True
             thread.start()
             
@@ -517,16 +1283,18 @@ class MyHandler(http.server.SimpleHTTPRequestHandler):
             self.send_response(200)
             self.send_header('Content-type', 'application/json; charset=utf-8')
             self.end_headers()
-            self.wfile.write(json.dumps({'running': pdf_script_running}).encode('utf-8'))
+            self.wfile.write(json.dumps({'running': pdf_script_running, 'throttle': IO_THROTTLE.status()}).encode('utf-8'))
             return
 
 
 
 
-def start_server(port=PORT):
+def start_server(port=None):
     """
     Starts the HTTP server.
     """
+    if port is None:
+        port = config.PORT
     try:
         httpd = socketserver.TCPServer(("", port), MyHandler)
         print(f"Serving at http://localhost:{port}")
@@ -538,6 +1306,10 @@ def start_server(port=PORT):
 
 
 if __name__ == "__main__":
+    # Load configuration once, explicitly, before serving
+    config.load_config()
+    apply_io_limits()
+
     # Start the server in a separate thread.
     server_thread = threading.Thread(target=start_server)
     server_thread.daemon = True  # So the server shuts down when the main thread does.
@@ -0,0 +1,444 @@
+"""
+Duplicate-move plans for The Data Librarian.
+Detection writes a compact plan file (JSON Lines); a separate apply step runs it
+with a pool of movers and records every finished action in a journal, so an
+interrupted apply can resume and a finished one can be undone.
+Author: Jesse Tudela
+"""
+
+import os
+import json
+import errno
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional, TextIO
+
+from utils import calculate_sha256, log_message
+
+PLAN_VERSION = 1
+
+ACTION_MOVE = "move"
+ACTION_HARDLINK = "hardlink"
+ACTION_REFLINK = "reflink"
+ACTIONS = (ACTION_MOVE, ACTION_HARDLINK, ACTION_REFLINK)
+
+JOURNAL_SUFFIX = ".journal"
+
+# Linux FICLONE ioctl: share extents with the source file (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+class PlanWriter:
+    """
+    Streams plan entries to disk as detection finds them.
+    Holding-bin names are made unique at plan time so no two entries collide.
+    """
+
+    def __init__(self, plan_path: str, holding_dir: str, scan_dir: str):
+        self.plan_path = plan_path
+        self.holding_dir = os.path.abspath(holding_dir)
+        self.count = 0
+        self.total_bytes = 0
+        self._taken = set()
+        self._file = open(plan_path, "w", encoding="utf-8")
+        self._write({
+            "plan": PLAN_VERSION,
+            "created": datetime.now().isoformat(),
+            "scan_dir": os.path.abspath(scan_dir),
+            "holding_dir": self.holding_dir,
+        })
+
+    def add(self, src: str, original: str, file_hash: str, dest_name: str) -> str:
+        """
+        Records one duplicate.
+
+        Args:
+            src (str): Path of the duplicate.
+            original (str): Path of the first copy seen (kept in place).
+            file_hash (str): SHA256 of both files.
+            dest_name (str): Sanitized file name for the holding bin.
+
+        Returns:
+            str: The holding-bin path reserved for this duplicate.
+        """
+        dst = unique_destination(self.holding_dir, dest_name, self._taken)
+        record = {"src": src, "dst": dst, "orig": original, "hash": file_hash, "size": 0}
+        # Size and mtime of both copies, so apply can tell if either changed since planning
+        try:
+            st = os.stat(src)
+            record.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        except OSError:
+            pass
+        try:
+            st = os.stat(original)
+            record.update(orig_size=st.st_size, orig_mtime_ns=st.st_mtime_ns)
+        except OSError:
+            pass
+        self._write(record)
+        size = record["size"]
+        self.count += 1
+        self.total_bytes += size
+        return dst
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+def unique_destination(directory: str, name: str, taken: set) -> str:
+    """
+    Returns a path in directory for name that is neither on disk nor already reserved,
+    appending " (n)" before the extension if needed. The result is added to taken.
+    """
+    stem, ext = os.path.splitext(name)
+    candidate = os.path.join(directory, name)
+    n = 1
+    while candidate in taken or os.path.lexists(candidate):
+        candidate = os.path.join(directory, f"{stem} ({n}){ext}")
+        n += 1
+    taken.add(candidate)
+    return candidate
+
+
+def read_plan(plan_path: str):
+    """
+    Reads a plan file.
+
+    Returns:
+        tuple: (header dict, list of entry dicts)
+    """
+    with open(plan_path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("plan") != PLAN_VERSION:
+            raise ValueError(f"Unsupported plan version: {header.get('plan')!r}")
+        entries = [json.loads(line) for line in f if line.strip()]
+    return header, entries
+
+
+def read_journal(plan_path: str) -> dict:
+    """
+    Reads the journal of a plan.
+
+    Returns:
+        dict: Entry index -> last journal record for it.
+    """
+    records = {}
+    journal_path = plan_path + JOURNAL_SUFFIX
+    if not os.path.exists(journal_path):
+        return records
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line from a crash; everything before it is valid
+                continue
+            records[record["i"]] = record
+    return records
+
+
+class _Journal:
+    """
+    Append-only, thread-safe journal writer. Each record is flushed as it is written.
+    """
+
+    def __init__(self, plan_path: str):
+        self._file = open(plan_path + JOURNAL_SUFFIX, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def record(self, **fields) -> None:
+        line = json.dumps(fields, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _changed_since_plan(path: str, size, mtime_ns, file_hash: str) -> bool:
+    """
+    True if path no longer matches what the plan recorded for it.
+    Compares size and mtime; plans written without an mtime fall back to the hash.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return True
+    if size is not None and st.st_size != size:
+        return True
+    if mtime_ns is not None:
+        return st.st_mtime_ns != mtime_ns
+    return calculate_sha256(path) != file_hash
+
+
+def verify_entry(entry: dict) -> Optional[str]:
+    """
+    Checks that a plan entry's duplicate and original are both unchanged since planning.
+
+    Returns:
+        Optional[str]: Why the entry must not be applied, or None if it is safe.
+    """
+    if _changed_since_plan(entry["src"], entry.get("size"), entry.get("mtime_ns"), entry["hash"]):
+        return "duplicate changed since the plan was written"
+    if _changed_since_plan(entry["orig"], entry.get("orig_size"), entry.get("orig_mtime_ns"), entry["hash"]):
+        return "original changed since the plan was written"
+    return None
+
+
+def move_file(src: str, dst: str) -> bool:
+    """
+    Moves a file without ever overwriting dst: a file already at dst (even one created a
+    moment ago) raises FileExistsError instead of being replaced.
+    On the same filesystem dst is hardlinked first and src unlinked; the link fails if dst exists.
+
+    Returns:
+        bool: True if the file moved within the filesystem, False if it had to copy across devices.
+    """
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        raise
+    except OSError as e:
+        if e.errno == errno.EXDEV:
+            _copy_exclusive(src, dst)
+            os.remove(src)
+            return False
+        # Filesystem without hardlinks: reserve the name exclusively, then rename over the reservation
+        with open(dst, "xb"):
+            pass
+        try:
+            os.replace(src, dst)
+        except OSError:
+            os.remove(dst)
+            raise
+        return True
+    try:
+        os.unlink(src)
+    except OSError:
+        os.unlink(dst)
+        raise
+    return True
+
+
+def _copy_exclusive(src: str, dst: str) -> None:
+    """
+    Copies src to a new file at dst (with metadata), failing if dst exists. A partial copy is removed.
+    """
+    with open(src, "rb") as fsrc:
+        with open(dst, "xb") as fdst:
+            try:
+                shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+            except BaseException:
+                fdst.close()
+                os.remove(dst)
+                raise
+    shutil.copystat(src, dst)
+
+
+def reflink_file(src: str, dst: str) -> None:
+    """
+    Creates dst as a copy-on-write clone of src (Linux FICLONE).
+    Raises OSError where the platform or filesystem does not support it.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.ENOTSUP, "reflinks are not supported on this platform")
+
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+
+
+def replace_with_link(src: str, original: str, action: str) -> None:
+    """
+    Atomically replaces src with a hardlink or reflink to original.
+    The link is created beside src and renamed over it, so src is never missing.
+    """
+    temp_path = src + ".dl-link"
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+    if action == ACTION_HARDLINK:
+        os.link(original, temp_path)
+    else:
+        reflink_file(original, temp_path)
+        # A reflink is its own inode, so it can keep the duplicate's timestamps
+        shutil.copystat(src, temp_path)
+    os.replace(temp_path, src)
+
+
+def _unlink_copy(path: str) -> None:
+    """
+    Turns a linked file back into an independent copy with the same content.
+    """
+    temp_path = path + ".dl-unlink"
+    shutil.copy2(path, temp_path)
+    os.replace(temp_path, path)
+
+
+def apply_plan(plan_path: str, log: TextIO, action: str = ACTION_MOVE, workers: int = 4,
+               keep_running: Optional[Callable[[], bool]] = None) -> dict:
+    """
+    Executes a plan with a pool of workers. Entries already journaled as done are skipped,
+    so re-running an interrupted apply resumes where it stopped.
+
+    Args:
+        plan_path (str): Path of the plan file.
+        log (TextIO): Log file object (see utils.log_message).
+        action (str): 'move' to the holding bin, or 'hardlink'/'reflink' to replace
+            each duplicate with a link to its original.
+        workers (int): Number of concurrent movers.
+        keep_running (Callable): Returns False to stop scheduling new entries.
+
+    Returns:
+        dict: Counters: done, skipped, changed, errors, renamed, copied, bytes.
+            'changed' counts entries left alone because a file changed since planning.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown action {action!r}; expected one of {ACTIONS}")
+
+    header, entries = read_plan(plan_path)
+    journal_state = read_journal(plan_path)
+    stats = {"done": 0, "skipped": 0, "changed": 0, "errors": 0, "renamed": 0, "copied": 0, "bytes": 0}
+    stats_lock = threading.Lock()
+    taken = set()
+    taken_lock = threading.Lock()
+    # One log file shared by every mover; keep their lines whole
+    log_lock = threading.Lock()
+
+    def log_line(message):
+        with log_lock:
+            log_message(log, message)
+
+    if action == ACTION_MOVE:
+        os.makedirs(header["holding_dir"], exist_ok=True)
+
+    done_before = {i for i, record in journal_state.items() if record.get("status") == "done"}
+    log_message(log, f"Applying plan: {os.path.basename(plan_path)} ({len(entries) - len(done_before)} pending, "
+                     f"{len(done_before)} already done, action={action}, workers={workers})\n")
+
+    journal = _Journal(plan_path)
+    # Bounded in-flight work keeps memory flat on plans with millions of entries
+    in_flight = threading.BoundedSemaphore(max(1, workers) * 2)
+
+    def run_entry(i, entry):
+        try:
+            apply_entry(i, entry)
+        finally:
+            in_flight.release()
+
+    def apply_entry(i, entry):
+        if keep_running is not None and not keep_running():
+            return
+        src = entry["src"]
+        dst = entry["dst"]
+        try:
+            if not os.path.exists(src):
+                raise FileNotFoundError(errno.ENOENT, "File vanished before apply", src)
+            # Never move or overwrite a file whose content may differ from what was hashed
+            reason = verify_entry(entry)
+            if reason:
+                journal.record(i=i, status="skipped", action=action, src=src, reason=reason)
+                with stats_lock:
+                    stats["changed"] += 1
+                log_line(f"Skipped [{src!r}]: {reason}.\n")
+                return
+            renamed = None
+            if action == ACTION_MOVE:
+                # Another file may have appeared at the planned name since planning (or appear
+                # while moving); move_file never overwrites, so pick a fresh name and try again
+                with taken_lock:
+                    if os.path.lexists(dst) or dst in taken:
+                        dst = unique_destination(os.path.dirname(dst), os.path.basename(dst), taken)
+                    else:
+                        taken.add(dst)
+                while True:
+                    try:
+                        renamed = move_file(src, dst)
+                        break
+                    except FileExistsError:
+                        with taken_lock:
+                            dst = unique_destination(os.path.dirname(dst), os.path.basename(entry["dst"]), taken)
+            else:
+                replace_with_link(src, entry["orig"], action)
+            journal.record(i=i, status="done", action=action, src=src, dst=dst)
+            with stats_lock:
+                stats["done"] += 1
+                stats["bytes"] += entry.get("size", 0)
+                if renamed is True:
+                    stats["renamed"] += 1
+                elif renamed is False:
+                    stats["copied"] += 1
+        except Exception as e:
+            journal.record(i=i, status="error", action=action, src=src, error=repr(e))
+            with stats_lock:
+                stats["errors"] += 1
+            log_line(f"*** ERROR applying {action} for [{src!r}]: {e!r}\n")
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for i, entry in enumerate(entries):
+                if i in done_before:
+                    with stats_lock:
+                        stats["skipped"] += 1
+                    continue
+                if keep_running is not None and not keep_running():
+                    break
+                in_flight.acquire()
+                pool.submit(run_entry, i, entry)
+    finally:
+        journal.close()
+
+    log_message(log, f"Plan applied: {stats['done']} done, {stats['errors']} error(s), {stats['skipped']} skipped, "
+                     f"{stats['changed']} changed since planning "
+                     f"({stats['renamed']} renamed, {stats['copied']} copied across devices, "
+                     f"{stats['bytes'] / (1024 * 1024):.2f}MB).\n")
+    return stats
+
+
+def undo_plan(plan_path: str, log: TextIO) -> dict:
+    """
+    Reverts every journaled 'done' entry of a plan, newest first.
+    Moves are renamed back; links are turned back into independent copies.
+
+    Returns:
+        dict: Counters: undone, errors.
+    """
+    journal_state = read_journal(plan_path)
+    done = [r for r in journal_state.values() if r.get("status") == "done"]
+    done.sort(key=lambda r: r["i"], reverse=True)
+    stats = {"undone": 0, "errors": 0}
+
+    log_message(log, f"Undoing plan: {os.path.basename(plan_path)} ({len(done)} entries)\n")
+
+    journal = _Journal(plan_path)
+    try:
+        for record in done:
+            src = record["src"]
+            try:
+                if record["action"] == ACTION_MOVE:
+                    if os.path.lexists(src):
+                        raise FileExistsError(errno.EEXIST, "Original location is occupied", src)
+                    os.makedirs(os.path.dirname(src), exist_ok=True)
+                    move_file(record["dst"], src)
+                else:
+                    _unlink_copy(src)
+                journal.record(i=record["i"], status="undone", action=record["action"], src=src, dst=record.get("dst"))
+                stats["undone"] += 1
+            except Exception as e:
+                stats["errors"] += 1
+                log_message(log, f"*** ERROR undoing [{src!r}]: {e!r}\n")
+    finally:
+        journal.close()
+
+    log_message(log, f"Undo finished: {stats['undone']} reverted, {stats['errors']} error(s).\n")
+    return stats
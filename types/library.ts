@@ -6,5 +6,17 @@ export namespace DataLibrarian {
         size?: string;
         created: string;
         modified: string;
+        bytes?: number;
+        file_count?: number;
+        duplicate_bytes?: number;
+    }
+
+    export interface SearchPage {
+        results: CatalogCard[];
+        total: number;
+        total_capped: boolean;
+        page: number;
+        page_size: number;
+        took_ms: number;
     }
 }